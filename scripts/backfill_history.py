@@ -13,7 +13,6 @@ i stedet for aa vente 6 uker paa at historikk samler seg.
 
 Kjoer: python scripts/backfill_history.py
 """
-import json
 from pathlib import Path
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
@@ -21,6 +20,8 @@ from zoneinfo import ZoneInfo
 import pandas as pd
 import numpy as np
 
+from lib_io import loads, save_json
+
 # Importer alt fra generate_report saa vi bruker EKSAKT samme logikk
 import importlib.util
 import os
@@ -94,7 +95,7 @@ def main():
         try:
             r = requests.get(f"{PAGES_HIST}/manifest.json", timeout=20)
             if r.status_code == 200:
-                for d in r.json().get("dates", [])[-60:]:
+                for d in loads(r.content).get("dates", [])[-60:]:
                     rr = requests.get(f"{PAGES_HIST}/{d}.json", timeout=15)
                     if rr.status_code == 200:
                         (HIST_DIR / f"{d}.json").write_bytes(rr.content)
@@ -161,20 +162,19 @@ def main():
         # ikke overskriv ekte (ikke-backfilled) snapshots
         if out.exists():
             try:
-                existing = json.loads(out.read_text(encoding="utf-8"))
+                existing = loads(out.read_bytes())
                 if not existing.get("backfilled"):
                     print(f"  hopper over {friday} (ekte data finnes)")
                     continue
             except Exception:
                 pass
-        out.write_text(json.dumps(snapshot, ensure_ascii=False, indent=2), encoding="utf-8")
+        save_json(out, snapshot)
         written += 1
         print(f"  skrev {friday} ({len(scores)} instrumenter)")
 
     # 4. Oppdater manifest
     all_dates = sorted([p.stem for p in HIST_DIR.glob("*.json") if p.stem != "manifest"])
-    (HIST_DIR / "manifest.json").write_text(
-        json.dumps({"dates": all_dates}, ensure_ascii=False, indent=2), encoding="utf-8")
+    save_json(HIST_DIR / "manifest.json", {"dates": all_dates})
 
     print(f"Ferdig – skrev {written} snapshots, manifest har {len(all_dates)} datoer")
 
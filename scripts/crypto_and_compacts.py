@@ -10,13 +10,14 @@ Denne jobben:
 - bruker PPLT for platina
 """
 import os
-import json
 import math
 import re
 import time
 import html
 from pathlib import Path
 
+from lib_io import load_json, save_json, list_files
+
 import requests
 import yfinance as yf
 import pandas as pd
@@ -93,32 +94,26 @@ INSTRUMENT_GROUPS = [
 REMOVED_IDS = {"UTWO", "UTEN", "2S10S", "SCHP", "SOXQ", "PLTM"}
 
 
-def load_json(path: Path, default):
-    try:
-        raw = path.read_text(encoding="utf-8")
-        if not raw.strip():
-            return default
-        return json.loads(raw)
-    except Exception:
-        return default
-
-
-def save_json(path: Path, obj):
-    path.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
-
-
 def sma(s, n):
-    return s.rolling(n).mean()
+    # prefiks-sum i stedet for rolling; NaN i vinduet gir NaN (som rolling(n).mean())
+    a = s.to_numpy(dtype=np.float64)
+    out = np.full(len(a), np.nan)
+    if len(a) >= n:
+        nan = np.isnan(a)
+        c = np.concatenate(([0.0], np.cumsum(np.where(nan, 0.0, a))))
+        k = np.concatenate(([0], np.cumsum(nan)))
+        out[n - 1:] = np.where(k[n:] - k[:-n] > 0, np.nan, (c[n:] - c[:-n]) / n)
+    return pd.Series(out, index=s.index, name=s.name)
 
 
 def rsi(s, n=14):
-    delta = s.diff()
-    up = delta.clip(lower=0)
-    down = -delta.clip(upper=0)
-    roll_up = up.ewm(alpha=1 / n, adjust=False).mean()
-    roll_down = down.ewm(alpha=1 / n, adjust=False).mean()
-    rs = roll_up / roll_down
-    return 100 - (100 / (1 + rs))
+    # Wilder-glatting av gevinst og tap i ett 2-kolonners ewm-kall (som RSI i generate_report)
+    d = s.diff().to_numpy(dtype=np.float64)
+    gl = np.column_stack((np.clip(d, 0, None), np.clip(-d, 0, None)))
+    avg = pd.DataFrame(gl, index=s.index).ewm(alpha=1 / n, adjust=False).mean().to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg[:, 0] / avg[:, 1]
+    return pd.Series(100 - (100 / (1 + rs)), index=s.index, name=s.name)
 
 
 def macd(s, fast=12, slow=26, signal=9):
@@ -134,19 +129,27 @@ def pct(a, b):
     return (a - b) / b if (b is not None and b != 0) else np.nan
 
 
+def dist_to_sma36(df):
+    # siste rad (close_use, sma36) som ndarray en gang, i stedet for flere iloc[-1]
+    if df is None or df.empty or "sma36" not in df.columns:
+        return None
+    last, ma = df[["close_use", "sma36"]].to_numpy(dtype=np.float64)[-1]
+    return None if np.isnan(ma) else float(pct(last, ma))
+
+
 def normalize_yf_df(df):
+    # Eksplisitt per kolonne: kun close og volume leses/konverteres, ingen kopi av hele rammen
     if df is None or getattr(df, "empty", True):
         return None
-    out = df.copy()
-    if isinstance(out.columns, pd.MultiIndex):
-        out.columns = out.columns.get_level_values(0)
-    out = out.rename(columns=str.lower)
-    if "close" not in out.columns:
+    cols = {str(c).lower(): i for i, c in enumerate(df.columns.get_level_values(0))}
+    if "close" not in cols:
         return None
-    out["close_use"] = pd.to_numeric(out["close"], errors="coerce")
-    if "volume" not in out.columns:
-        out["volume"] = np.nan
-    out.index = pd.to_datetime(out.index)
+    close = pd.to_numeric(df.iloc[:, cols["close"]], errors="coerce").to_numpy(dtype=np.float64)
+    if "volume" in cols:
+        vol = pd.to_numeric(df.iloc[:, cols["volume"]], errors="coerce").to_numpy(dtype=np.float64)
+    else:
+        vol = np.full(len(close), np.nan)
+    out = pd.DataFrame({"close_use": close, "volume": vol}, index=pd.to_datetime(df.index))
     out = out.sort_index()
     out = out[~out.index.duplicated(keep="last")]
     out = out.dropna(subset=["close_use"])
@@ -246,7 +249,7 @@ def plot_compact(df, title, out_compact, ma_len=36):
     axes[2].legend(loc="upper left")
 
     plt.tight_layout()
-    plt.savefig(out_compact, dpi=120)
+    plt.savefig(out_compact, dpi=120, pil_kwargs={"compress_level": 1}, metadata={"Software": None})
     plt.close(fig)
 
 
@@ -423,10 +426,8 @@ def main():
             last_252 = daily.tail(252)
             entry["52w_high"] = float(last_252["close_use"].max()) if not last_252.empty else None
             entry["52w_low"] = float(last_252["close_use"].min()) if not last_252.empty else None
-            weekly_sma = weekly["sma36"].iloc[-1] if not weekly.empty else np.nan
-            monthly_sma = monthly["sma36"].iloc[-1] if not monthly.empty else np.nan
-            entry["dist_to_36WMA"] = float(pct(weekly["close_use"].iloc[-1], weekly_sma)) if pd.notna(weekly_sma) else None
-            entry["dist_to_36MMA"] = float(pct(monthly["close_use"].iloc[-1], monthly_sma)) if pd.notna(monthly_sma) else None
+            entry["dist_to_36WMA"] = dist_to_sma36(weekly)
+            entry["dist_to_36MMA"] = dist_to_sma36(monthly)
 
             if not weekly.empty:
                 plot_compact(weekly.tail(400), f"{inst['label']} ({inst['symbol_label']}) - weekly", CHARTS / f"{instrument_id}_weekly_compact.png")
@@ -442,7 +443,7 @@ def main():
     idx["notes"]["instrument_count"] = sum(len(g["instruments"]) for g in INSTRUMENT_GROUPS)
     save_json(INDEX, idx)
 
-    files = sorted([f"charts/{fn.name}" for fn in CHARTS.glob("*.png")])
+    files = list_files(CHARTS, ".png", prefix="charts/")
     save_json(FILELIST, {"charts": files})
 
     (DOCS / "index.html").write_text(build_homepage(idx, files), encoding="utf-8")
@@ -1,52 +1,70 @@
 #!/usr/bin/env python3
 # scripts/export_for_chatgpt.py
-import json, re, html, datetime
+import os, html, datetime
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from lib_io import dumps as _dumps, load_json, atomic_write_bytes, RAW_BASE, JSD_BASE, PAG_BASE
 
 ROOT = Path(__file__).resolve().parents[1]
 DOCS = ROOT / "docs"
+PAGES_BASE = PAG_BASE + "/"
+# feeden leses av maskiner; innrykk kun ved FEED_PRETTY=1 (html-visningen er alltid pen)
+FEED_PRETTY = os.environ.get("FEED_PRETTY") == "1"
 
-def load_json(p, default=None):
-    fallback = {} if default is None else default
-    try:
-        raw = Path(p).read_text(encoding="utf-8")
-    except Exception:
-        return fallback
-    if not raw.strip():
-        return fallback
-    try:
-        return json.loads(raw)
-    except Exception:
-        return fallback
+FEED_MIRRORS = {
+    "primary":  f"{RAW_BASE}/chatgpt_feed.json",
+    "jsdelivr": f"{JSD_BASE}/chatgpt_feed.json",
+    "pages":    f"{PAG_BASE}/chatgpt_feed.json",
+    "txt":      f"{PAG_BASE}/chatgpt_feed.txt",
+    "html":     f"{PAG_BASE}/chatgpt_feed.html",
+}
+
+_EMPTY = {}  # kun lesing; ikke returner/muter denne
+
+# charts/<TICKER>_<tf>_compact.png; fast form, saa str-metoder i stedet for regex
+_COMPACT_SUFFIX = "_compact.png"
+_CHART_TFS = frozenset(("weekly", "monthly"))
 
 def norm(s):
-    return re.sub(r"\\s+", " ", s or "").strip()
+    return " ".join(s.split()) if s else ""
 
+@lru_cache(maxsize=4096)
 def absolute_url(u):
-    if not u:
-        return u
-    if u.startswith("http://") or u.startswith("https://"):
+    if not u or u.startswith(("http://", "https://")):
         return u
-    return f"https://regg92s-hub.github.io/market-daily-report/{u.lstrip('/')}"
+    return PAGES_BASE + u.lstrip("/")
 
-def charts_from_filelist(filelist):
+def filelist_entries(raw):
+    if isinstance(raw, dict):
+        raw = raw.get("charts") or raw.get("files")
+    return raw if isinstance(raw, list) else []
+
+def charts_from_filelist(filelist, wanted=None):
+    # flat (ticker, tf) -> url; ett oppslag per graf
     out = {}
     for p in filelist:
         fp = str(p)
-        if not fp.endswith(".png"):
+        if not fp.endswith(_COMPACT_SUFFIX):
+            continue
+        d, _, name = fp.rpartition("/")
+        if d != "charts" and not d.endswith("/charts"):
             continue
-        m = re.search(r"(?:^|/)charts/([A-Za-z0-9\-_]+)_(weekly|monthly)_compact\\.png$", fp)
-        if not m:
+        ticker, _, tf = name[:-len(_COMPACT_SUFFIX)].rpartition("_")
+        if wanted is not None and ticker not in wanted:
+            continue  # graf for et instrument som ikke er i feeden
+        if tf not in _CHART_TFS or not ticker or not ticker.isascii() \
+                or not ticker.replace("-", "A").replace("_", "A").isalnum():
             continue
-        ticker, tf = m.group(1), m.group(2)
-        out.setdefault(ticker, {})
-        out[ticker][tf] = absolute_url(fp)
+        out[(ticker, tf)] = absolute_url(fp)
     return out
 
 def build_feed(index_data, filelist, news):
-    charts_map = charts_from_filelist(filelist)
-    assets = ((index_data or {}).get("summary") or {}).get("assets") or {}
-    categories = ((index_data or {}).get("summary") or {}).get("categories") or []
+    summary = (index_data.get("summary") if isinstance(index_data, dict) else None) or _EMPTY
+    assets = summary.get("assets") or {}
+    categories = summary.get("categories") or []
+    # uten assets (tom/HTML index.json) brukes ingen grafer; hopp over filelist-parsingen
+    charts_map = charts_from_filelist(filelist, wanted=assets.keys()) if assets else {}
 
     category_map = {}
     for cat in categories:
@@ -59,8 +77,9 @@ def build_feed(index_data, filelist, news):
 
     tickers = []
     for instrument_id, asset in assets.items():
-        monthly = (asset.get("frames") or {}).get("monthly") or {}
-        weekly = (asset.get("frames") or {}).get("weekly") or {}
+        frames = asset.get("frames") or _EMPTY
+        weekly = frames.get("weekly") or _EMPTY
+        monthly = frames.get("monthly") or _EMPTY
         tickers.append({
             "ticker": instrument_id,
             "display_name": asset.get("display_name"),
@@ -76,8 +95,8 @@ def build_feed(index_data, filelist, news):
                 "monthly_macd": monthly.get("macd"),
             },
             "charts": {
-                "weekly": charts_map.get(instrument_id, {}).get("weekly"),
-                "monthly": charts_map.get(instrument_id, {}).get("monthly"),
+                "weekly": charts_map.get((instrument_id, "weekly")),
+                "monthly": charts_map.get((instrument_id, "monthly")),
             },
         })
 
@@ -91,34 +110,30 @@ def build_feed(index_data, filelist, news):
     elif isinstance(news, list):
         raw_items = news
 
+    seen = set()
     for item in raw_items:
         title = norm(item.get("title") or item.get("headline"))
-        summary = norm(item.get("summary") or item.get("desc") or item.get("description"))
         url = item.get("url") or item.get("link")
-        image = item.get("image") or item.get("image_url")
-        ts = item.get("ts") or item.get("timestamp") or item.get("published_at") or item.get("published")
-        source = item.get("source") or item.get("site") or "news"
         if not title and not url:
             continue
+        key = url or title  # samme sak fra flere kilder/kjoeringer -> en gang
+        if key in seen:
+            continue
+        seen.add(key)
+        # resten av feltene slaas kun opp for saker som faktisk tas med
         news_out.append({
             "title": title,
-            "summary": summary,
+            "summary": norm(item.get("summary") or item.get("desc") or item.get("description")),
             "url": url,
-            "image": image,
-            "timestamp": ts,
-            "source": source,
+            "image": item.get("image") or item.get("image_url"),
+            "timestamp": item.get("ts") or item.get("timestamp") or item.get("published_at") or item.get("published"),
+            "source": item.get("source") or item.get("site") or "news",
         })
 
     feed = {
         "spec": "chatgpt-feed-v2",
         "generated_utc": datetime.datetime.utcnow().replace(microsecond=0).isoformat() + "Z",
-        "mirrors": {
-            "primary":  "https://raw.githubusercontent.com/regg92s-hub/market-daily-report/gh-pages/chatgpt_feed.json",
-            "jsdelivr": "https://cdn.jsdelivr.net/gh/regg92s-hub/market-daily-report@gh-pages/chatgpt_feed.json",
-            "pages":    "https://regg92s-hub.github.io/market-daily-report/chatgpt_feed.json",
-            "txt":      "https://regg92s-hub.github.io/market-daily-report/chatgpt_feed.txt",
-            "html":     "https://regg92s-hub.github.io/market-daily-report/chatgpt_feed.html",
-        },
+        "mirrors": FEED_MIRRORS,
         "tickers": tickers,
         "news": news_out,
     }
@@ -126,37 +141,26 @@ def build_feed(index_data, filelist, news):
 
 def write_all(feed):
     DOCS.mkdir(parents=True, exist_ok=True)
-    with open(DOCS / "chatgpt_feed.json", "w", encoding="utf-8") as f:
-        json.dump(feed, f, ensure_ascii=False, indent=2)
-    with open(DOCS / "chatgpt_feed.txt", "w", encoding="utf-8") as f:
-        f.write(json.dumps(feed, ensure_ascii=False))
-    pretty = html.escape(json.dumps(feed, ensure_ascii=False, indent=2))
+    # en serialisering per format: kompakt (txt, og json som standard) + pen (html)
+    compact = _dumps(feed)
+    indented = _dumps(feed, indent=True)
+    atomic_write_bytes(DOCS / "chatgpt_feed.json", indented if FEED_PRETTY else compact)
+    atomic_write_bytes(DOCS / "chatgpt_feed.txt", compact)
+    pretty = html.escape(indented.decode("utf-8"))
     html_doc = f"""<!doctype html>
 <html><head><meta charset="utf-8"><title>chatgpt_feed</title></head>
 <body>
 <h1>chatgpt_feed</h1>
 <pre id="feed">{pretty}</pre>
 </body></html>"""
-    with open(DOCS / "chatgpt_feed.html", "w", encoding="utf-8") as f:
-        f.write(html_doc)
+    atomic_write_bytes(DOCS / "chatgpt_feed.html", html_doc.encode("utf-8"))
 
 def main():
-    idx = load_json(DOCS / "index.json", default={}) if (DOCS / "index.json").exists() else {}
-    fl_path = DOCS / "filelist.json"
-    if fl_path.exists():
-        fl_raw = load_json(fl_path, default={})
-        if isinstance(fl_raw, list):
-            filelist = fl_raw
-        else:
-            filelist = fl_raw.get("charts", fl_raw.get("files", []))
-    else:
-        filelist = []
-
-    news = {}
-    npath = DOCS / "news" / "news.json"
-    if npath.exists():
-        raw = load_json(npath, default={})
-        news = raw
+    # load_json gir default ved manglende fil; de tre filene leses samtidig
+    paths = (DOCS / "index.json", DOCS / "filelist.json", DOCS / "news" / "news.json")
+    with ThreadPoolExecutor(max_workers=len(paths)) as ex:
+        idx, fl_raw, news = ex.map(load_json, paths)
+    filelist = filelist_entries(fl_raw)
 
     feed = build_feed(idx, filelist, news)
     write_all(feed)
@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import re, json, time
+import os, re, time, hashlib, html, tempfile
 from pathlib import Path
 from datetime import datetime, timezone, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from heapq import nlargest
+from itertools import chain
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 import feedparser
+from lib_io import loads, save_json
 
 OUTDIR = Path("docs/news")
 OUTDIR.mkdir(parents=True, exist_ok=True)
@@ -16,38 +20,68 @@ FEEDS = [
     ("Northstar", "https://northstarbadcharts.com/feed/"),
 ]
 LOOKBACK_DAYS = 3
+MAX_POSTS = 20
+
+HEAD_BYTES = 256 * 1024
+CHUNK_BYTES = 64 * 1024
+MAX_IMAGE_BYTES = 4 * 1024 * 1024
+_IMG_RX = re.compile(rb"""<img\b[^>]*?\ssrc\s*=\s*["']([^"']+)""", re.I)
 
 UA = {"User-Agent": "Mozilla/5.0 (compatible; MDReportBot/1.0; +https://example.com)"}
+MAX_WORKERS = 8  # hoeflig mot feed-sidene
+
+# delt session: keep-alive/connection pooling paa tvers av artikkel- og bildehenting
+SESSION = requests.Session()
+SESSION.headers.update(UA)
+SESSION.mount("https://", HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS))
 
 def clean_filename(s):
     s = re.sub(r"[^a-zA-Z0-9_.-]+", "_", s.strip())[:80]
     return s or f"img_{int(time.time())}"
 
 def fetch_first_image(url):
+    # foerste <img> ligger tidlig i artikkelen: les maks HEAD_BYTES og regex paa bytes (ingen parse-tre)
     try:
-        html = requests.get(url, timeout=20, headers=UA).text
-        soup = BeautifulSoup(html, "html.parser")
-        img = soup.find("img")
-        if img and img.get("src"):
-            return img["src"]
+        with SESSION.get(url, timeout=20, stream=True) as r:
+            r.raw.decode_content = True
+            head = r.raw.read(HEAD_BYTES)
     except Exception:
         return None
+    m = _IMG_RX.search(head)
+    if m:
+        return html.unescape(m.group(1).decode("utf-8", "ignore"))
     return None
 
 def download(url, dest):
+    # stroem til en egen .part per jobb i biter; avbryt hvis bildet er urimelig stort
+    # (eksisterende fil beroeres ikke, og samtidige jobber deler aldri temp-fil)
+    part = None
     try:
-        r = requests.get(url, timeout=30, headers=UA)
-        r.raise_for_status()
-        dest.write_bytes(r.content)
+        with SESSION.get(url, timeout=30, stream=True) as r:
+            r.raise_for_status()
+            total = 0
+            with tempfile.NamedTemporaryFile(dir=dest.parent, prefix=dest.name + ".",
+                                             suffix=".part", delete=False) as f:
+                part = Path(f.name)
+                for chunk in r.iter_content(CHUNK_BYTES):
+                    total += len(chunk)
+                    if total > MAX_IMAGE_BYTES:
+                        raise ValueError("image too large")
+                    f.write(chunk)
+        os.replace(part, dest)
         return True
     except Exception:
+        if part is not None:
+            part.unlink(missing_ok=True)
         return False
 
 def load_existing():
-    if not OUTJSON.exists():
+    try:
+        raw = OUTJSON.read_bytes()  # EAFP: ingen egen exists()-stat
+    except OSError:
         return []
     try:
-        data = json.loads(OUTJSON.read_text(encoding="utf-8"))
+        data = loads(raw)
         # Aksepter både list og dict; normaliser til list
         if isinstance(data, list):
             return data
@@ -60,42 +94,90 @@ def load_existing():
     except Exception:
         return []
 
+def _post_key(p):
+    # 16-byte md5-digest i stedet for tuple av tre strenger (ikke kryptografisk bruk)
+    # feltene strippes ved innlesing (main), ikke per noekkel
+    raw = f"{p.get('title') or ''}\x1f{p.get('url') or ''}\x1f{p.get('published') or ''}"
+    return hashlib.md5(raw.encode("utf-8", "ignore")).digest()
+
+def _sort_key(p):
+    # epoch-int sammenlignes raskere enn ISO-strenger; beregnes lazily for poster fra disk
+    k = p.get("_sort")
+    if k is None:
+        try:
+            k = int(datetime.fromisoformat(p.get("published") or "").timestamp())
+        except (TypeError, ValueError):
+            k = 0
+        p["_sort"] = k
+    return k
+
+def feed_entries(url):
+    # hent selv via SESSION (gjenbrukt forbindelse) og gi bytes til feedparser
+    try:
+        r = SESSION.get(url, timeout=20)
+        r.raise_for_status()
+    except Exception:
+        return []  # som feedparser.parse(url) ved feil: ingen entries
+    return feedparser.parse(r.content).entries
+
+def image_for(source, title, link):
+    img_url = fetch_first_image(link)
+    if not img_url:
+        return None
+    ext = (img_url.split("?")[0].split(".")[-1] or "jpg")
+    ext = "jpg" if len(ext) > 5 else ext  # defensivt
+    # kort hash av lenken: serieposter med lik tittel-start (kuttet til 80 tegn) faar ulike navn
+    tag = hashlib.sha1(link.encode("utf-8", "ignore")).hexdigest()[:8]
+    name = clean_filename(f"{source}_{title}") + "_" + tag + "." + ext
+    if download(img_url, OUTDIR/name):
+        return f"news/{name}"
+    return None
+
 def main():
     cutoff = datetime.now(timezone.utc) - timedelta(days=LOOKBACK_DAYS)
     posts=[]
-    for source, feed in FEEDS:
-        d = feedparser.parse(feed)
-        for e in d.entries:
-            try:
-                published = datetime(*e.published_parsed[:6], tzinfo=timezone.utc)
-            except Exception:
-                published = datetime.now(timezone.utc)
-            if published < cutoff:
-                continue
-            title = e.title
-            link  = e.link
-            img_url = fetch_first_image(link)
-            img_file = None
-            if img_url:
-                ext = (img_url.split("?")[0].split(".")[-1] or "jpg")
-                ext = "jpg" if len(ext) > 5 else ext  # defensivt
-                name = clean_filename(f"{source}_{title}") + "." + ext
-                dest = OUTDIR/name
-                if download(img_url, dest):
-                    img_file = f"news/{name}"
+    # feeds og artikkel/bilde-henting er uavhengig I/O: kjoer samtidig, men behold rekkefoelgen
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
+        parsed = list(ex.map(lambda f: feed_entries(f[1]), FEEDS))
+        pending, jobs = [], {}
+        for (source, _), entries in zip(FEEDS, parsed):
+            for e in entries:
+                try:
+                    published = datetime(*e.published_parsed[:6], tzinfo=timezone.utc)
+                except Exception:
+                    published = datetime.now(timezone.utc)
+                if published < cutoff:
+                    continue
+                title = e.title.strip()
+                link  = e.link.strip()
+                # samme innlegg to ganger (f.eks. i begge feeds) -> en jobb per destinasjon
+                key = (source, title, link)
+                if key not in jobs:
+                    jobs[key] = ex.submit(image_for, source, title, link)
+                pending.append((source, title, link, published, jobs[key]))
+        for source, title, link, published, img in pending:
             posts.append({
                 "source": source,
                 "title": title,
                 "url": link,
                 "published": published.isoformat(),
-                "image": img_file
+                "image": img.result(),
+                "_sort": int(published.timestamp()),
             })
 
-    existing = load_existing()
-    merged = posts + existing
-    merged.sort(key=lambda x: x.get("published",""), reverse=True)
-    merged = merged[:20]
-    OUTJSON.write_text(json.dumps(merged, ensure_ascii=False, indent=2), encoding="utf-8")
+    # ferske poster foerst, saa beholdes nyeste versjon
+    seen = set()
+    def fresh(items):
+        for p in items:
+            key = _post_key(p)
+            if key not in seen:
+                seen.add(key)
+                yield p
+    # top-20 via heap (samme resultat som stabil sort+slice), uten aa sortere hele historikken
+    merged = nlargest(MAX_POSTS, fresh(chain(posts, load_existing())), key=_sort_key)
+    for p in merged:
+        p.pop("_sort", None)  # kun intern sorteringsnoekkel
+    save_json(OUTJSON, merged)
     print(f"Wrote {len(merged)} posts to {OUTJSON}")
 
 if __name__ == "__main__":
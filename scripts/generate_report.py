@@ -15,20 +15,16 @@ Ny i v4:
 - 9 ratio-charts
 - 4-panel mørke charts: pris+MA, RSI, MACD, MACD14
 """
-import os, json, time, math, re, html
+import os, time, math, re, html, hashlib, threading, multiprocessing
 from datetime import datetime
+from io import BytesIO
 from zoneinfo import ZoneInfo
 from pathlib import Path
 from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
 
-import requests
-import yfinance as yf
-import pandas as pd
-import numpy as np
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+from lib_io import list_files, loads, save_json
 
 VERSION = "2026-06-05-northstar-v8"
 import base64 as _b64mod
@@ -426,41 +422,77 @@ DOCS     = Path("docs")
 CHARTS   = DOCS / "charts"
 NEWS_DIR = DOCS / "news"
 DOCS.mkdir(exist_ok=True)
-CHARTS.mkdir(exist_ok=True)
-NEWS_DIR.mkdir(exist_ok=True)
 
 FORCE_INPUT       = os.environ.get("FORCE_RUN", "false").lower() == "true"
 IN_GITHUB_ACTIONS = os.environ.get("GITHUB_ACTIONS", "").lower() == "true"
 FORCE = FORCE_INPUT or IN_GITHUB_ACTIONS
 
 print(f"Full run: {FORCE} at {NOW.isoformat()} (version {VERSION})")
-with open(DOCS / "run_mode.json", "w", encoding="utf-8") as f:
-    json.dump({"force": FORCE, "now": NOW.isoformat(), "version": VERSION}, f, indent=2)
+save_json(DOCS / "run_mode.json", {"force": FORCE, "now": NOW.isoformat(), "version": VERSION})
 
 if not FORCE and not ((NOW.hour == 19 and NOW.minute >= 45) or (NOW.hour == 20 and NOW.minute <= 10)):
-    with open(DOCS / "heartbeat.json", "w", encoding="utf-8") as f:
-        json.dump({"last_run_local": NOW.isoformat(), "version": VERSION}, f, indent=2)
+    save_json(DOCS / "heartbeat.json", {"last_run_local": NOW.isoformat(), "version": VERSION})
     with open(DOCS / "index.html", "w", encoding="utf-8") as f:
         f.write(f"<!doctype html><meta charset='utf-8'><title>Market Daily Report</title>"
                 f"<h1>Market Daily Report</h1><p>{NOW.isoformat()}</p>"
                 f"<p>Full rapport genereres kl. 20:00 Europe/Oslo.</p>")
     raise SystemExit(0)
 
+# charts/ og news/ trengs kun av en full kjoering
+CHARTS.mkdir(exist_ok=True)
+NEWS_DIR.mkdir(exist_ok=True)
+
+# Tunge importer foerst etter gaten: heartbeat-kjoeringene (hvert 10. min) slipper
+# aa laste pandas/matplotlib/yfinance bare for aa skrive heartbeat.json
+import requests
+from requests.adapters import HTTPAdapter
+import yfinance as yf
+import pandas as pd
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib.figure import Figure
+import matplotlib.dates as mdates
+
+from lib_net import build_session, fetch_cached, prune_cache
+
 LOG = []
+_LOG_LOCK = threading.Lock()
 def log(msg):
-    print(msg)
-    LOG.append(f"{datetime.now().isoformat()}  {msg}")
+    # kalles ogsaa fra henting i traader; hold print + append samlet
+    with _LOG_LOCK:
+        print(msg)
+        LOG.append(f"{datetime.now().isoformat()}  {msg}")
 
 def flush_log():
     with open(DOCS / "run_log.txt", "w", encoding="utf-8") as f:
         f.write("\n".join(LOG) + "\n")
 
+FETCH_WORKERS = 8  # samtidige yf/FRED-kall; hoyere gir bare rate-limit hos Yahoo
+
 YF_SESSION = requests.Session()
 YF_SESSION.headers.update({"User-Agent": "Mozilla/5.0", "Accept": "*/*",
                             "Accept-Language": "en-US,en;q=0.9"})
+_yf_adapter = HTTPAdapter(pool_connections=2 * FETCH_WORKERS, pool_maxsize=2 * FETCH_WORKERS)
+YF_SESSION.mount("https://", _yf_adapter)
+YF_SESSION.mount("http://", _yf_adapter)
+
+# Disk-cache for prisserier (utenfor docs/, publiseres ikke). backfill_history kjoerer
+# rett foer generatoren i samme jobb og henter de samme seriene; da gjenbrukes de.
+CACHE_DIR     = Path(os.environ.get("MDR_CACHE_DIR", ".cache"))
+CACHE_MAX_AGE = 12 * 3600  # sekunder; daglig kjoering -> alltid ferske data neste dag
+HTTP_CACHE    = CACHE_DIR / "http"  # ETag/Last-Modified + body for RSS (lib_net.fetch_cached)
+HTTP_CACHE_MAX_AGE = 14 * 86400  # ubrukte oppfoeringer (f.eks. fjernede feeds) slettes etter dette
+# Del av noekkelen i "frames"-cachen (cached_frames). MAA bumpes ved enhver endring i
+# indikator-/resample-logikken (SMA, RSI, MACD*, with_indicators, resample_frames), ellers
+# serveres frames regnet med gammel kode saa lenge dagsserien er uendret (.cache lever i CI)
+FRAMES_CACHE_VERSION = 2
 
 FRED_KEY  = os.environ.get("FRED_API_KEY", "").strip()
 FRED_BASE = "https://api.stlouisfed.org/fred/series/observations"
+FRED_IDS  = ("DGS2", "DGS10", "WALCL")  # alle FRED-serier rapporten bruker; forhaandshentes samtidig
+FRED_SESSION = build_session(timeout_connect=5, timeout_read=60)  # keep-alive mot api.stlouisfed.org
+NEWS_SESSION = build_session(timeout_connect=5, timeout_read=30)
 
 # ─── INSTRUMENTS ───────────────────────────────────────────────
 INSTRUMENT_GROUPS = [
@@ -605,14 +637,30 @@ def tv_symbol(sym):
 
 # ─── MATH ──────────────────────────────────────────────────────
 def SMA(s, n):
-    return s.rolling(n).mean()
+    # O(N) prefiks-sum uten pandas-rolling. Hull (NaN) teller med i en egen prefiks-sum,
+    # slik at et vindu med NaN gir NaN - samme semantikk som s.rolling(n).mean()
+    a = s.to_numpy(dtype=np.float64)
+    out = np.full(len(a), np.nan)
+    if len(a) >= n:
+        nan = np.isnan(a)
+        c = np.concatenate(([0.0], np.cumsum(np.where(nan, 0.0, a))))
+        k = np.concatenate(([0], np.cumsum(nan)))
+        out[n-1:] = np.where(k[n:] - k[:-n] > 0, np.nan, (c[n:] - c[:-n]) / n)
+    return pd.Series(out, index=s.index, name=s.name)
+
+def tail_mean(s, n):
+    # = s.rolling(n).mean().iloc[-1], men leser kun de siste n verdiene
+    a = s.to_numpy(dtype=np.float64)[-n:]
+    return float(a.mean()) if len(a) == n and not np.isnan(a).any() else np.nan
 
 def RSI(s, n=14):
-    d  = s.diff()
-    up = d.clip(lower=0)
-    dn = -d.clip(upper=0)
-    rs = up.ewm(alpha=1/n, adjust=False).mean() / dn.ewm(alpha=1/n, adjust=False).mean()
-    return 100 - (100 / (1 + rs))
+    # Wilder-glatting (alpha=1/n) av gevinst og tap i ett 2-kolonners ewm-kall
+    d  = s.diff().to_numpy(dtype=np.float64)
+    gl = np.column_stack((np.clip(d, 0, None), np.clip(-d, 0, None)))
+    avg = pd.DataFrame(gl, index=s.index).ewm(alpha=1/n, adjust=False).mean().to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg[:, 0] / avg[:, 1]
+    return pd.Series(100 - (100 / (1 + rs)), index=s.index, name=s.name)
 
 def MACD_calc(s, fast=12, slow=26, sig=9):
     ef = s.ewm(span=fast, adjust=False).mean()
@@ -621,6 +669,26 @@ def MACD_calc(s, fast=12, slow=26, sig=9):
     sl = m.ewm(span=sig, adjust=False).mean()
     return m, sl, m - sl
 
+def ratio_of(num, den):
+    """num/den paa felles datoer. align(join="inner") gir snittet i ett pass, uten
+    union-indeks + reindeks + dropna via en mellomliggende DataFrame."""
+    n, d = num.align(den, join="inner")
+    a, b = n.to_numpy(dtype=np.float64), d.to_numpy(dtype=np.float64)
+    ok = ~(np.isnan(a) | np.isnan(b))
+    # divisjon paa ndarray: indeksene er allerede like, ingen ny justering i Series-/
+    return pd.Series(a[ok] / b[ok], index=n.index[ok])
+
+def MACD_both(s, sig=9):
+    """MACD 12/26 og 14/28 med felles signal-span: begge signal-linjene glattes i ett
+    2-kolonners ewm-kall (som RSI). Gir samme tall som to MACD_calc-kall."""
+    ema = {n: s.ewm(span=n, adjust=False).mean().to_numpy() for n in (12, 26, 14, 28)}
+    m  = np.column_stack((ema[12] - ema[26], ema[14] - ema[28]))
+    sl = pd.DataFrame(m, index=s.index).ewm(span=sig, adjust=False).mean().to_numpy()
+    h  = m - sl
+    mk = lambda a: pd.Series(a, index=s.index)
+    return ((mk(m[:, 0]), mk(sl[:, 0]), mk(h[:, 0])),
+            (mk(m[:, 1]), mk(sl[:, 1]), mk(h[:, 1])))
+
 def pct_dist(a, b):
     try:
         return (a - b) / b if b and not np.isnan(b) else np.nan
@@ -631,73 +699,225 @@ def safe_id(s):
     return re.sub(r"[^A-Za-z0-9_-]+", "_", s)
 
 # ─── DATA ──────────────────────────────────────────────────────
-def normalize_yf_df(data):
+def _cache_path(kind, key):
+    return CACHE_DIR / kind / f"{safe_id(key)}.pkl"
+
+def cache_load(kind, key, max_age=CACHE_MAX_AGE):
+    # max_age=None: returner cachen uansett alder (grunnlag for inkrementell henting)
+    p = _cache_path(kind, key)
+    try:
+        if max_age is not None and time.time() - p.stat().st_mtime > max_age:
+            return None
+        return pd.read_pickle(p)
+    except Exception:
+        return None
+
+def cache_save(kind, key, obj):
+    p = _cache_path(kind, key)
+    try:
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_name(p.name + ".tmp")
+        pd.to_pickle(obj, tmp)
+        os.replace(tmp, p)
+    except Exception as e:
+        log(f"  cache write error {kind}/{key}: {e}")
+
+def normalize_yf_df(data, min_rows=50):
+    # Kun close_use/volume brukes videre: bygg rammen av de to kolonnene direkte i stedet
+    # for aa kopiere og baere med open/high/low/dividends/stock splits (og cache dem)
     if data is None or getattr(data, "empty", True):
         return None
-    df = data.copy()
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = df.columns.get_level_values(0)
-    df = df.rename(columns=str.lower)
-    if "close" not in df.columns:
+    cols = {str(c).lower(): i for i, c in enumerate(data.columns.get_level_values(0))}
+    if "close" not in cols:
         return None
-    df["close_use"] = pd.to_numeric(df["close"], errors="coerce")
-    if "volume" not in df.columns:
-        df["volume"] = np.nan
-    df.index = pd.to_datetime(df.index)
+    close = pd.to_numeric(data.iloc[:, cols["close"]], errors="coerce").to_numpy(dtype=np.float64)
+    # volum brukes kun til forhold (vol_confirm) og plott: float32 holder, halv minnebruk.
+    # close_use beholdes i float64 - summary-tallene publiseres og sammenlignes i historikken
+    if "volume" in cols:
+        vol = pd.to_numeric(data.iloc[:, cols["volume"]], errors="coerce").to_numpy(dtype=np.float32)
+    else:
+        vol = np.full(len(close), np.nan, dtype=np.float32)
+    idx = pd.to_datetime(data.index)
+    if idx.tz is not None:  # Ticker.history gir boersens tidssone; resten av koden er tz-naiv
+        idx = idx.tz_localize(None)
+    df = pd.DataFrame({"close_use": close, "volume": vol}, index=idx)
     df = df.sort_index()[~df.index.duplicated(keep="last")].dropna(subset=["close_use"])
-    return df if len(df) >= 50 else None
+    return df if len(df) >= min_rows else None
+
+# Utgaatt cache -> hent kun halen fra (siste cachede dato - TAIL_OVERLAP) og skjoet paa
+TAIL_OVERLAP = pd.Timedelta(days=14)
+
+def merge_tail(old, new):
+    """Skjoet en nyhentet hale paa en cachet dagsserie. None hvis overlappen ikke stemmer:
+    auto_adjust justerer hele historikken bakover ved utbytte/splitt, og da maa hele serien
+    hentes paa nytt. Siste cachede rad holdes utenfor sammenligningen (kan ha vaert en
+    ufullstendig dag da den ble hentet)."""
+    if old is None or new is None or old.empty or new.empty:
+        return None
+    ov = old.index[(old.index >= new.index[0]) & (old.index < old.index[-1])].intersection(new.index)
+    if len(ov) == 0:
+        return None
+    a = old.loc[ov, "close_use"].to_numpy(dtype=np.float64)
+    b = new.loc[ov, "close_use"].to_numpy(dtype=np.float64)
+    if not np.allclose(a, b, rtol=1e-6, atol=0):
+        return None
+    return pd.concat([old[old.index < new.index[0]], new[old.columns.intersection(new.columns)]])
+
+# Dagsserier i minnet (sym -> normalisert df): fylles av yf_batch_daily og
+# yf_series_from_candidates, slik at trend/regime-oppslag paa samme symbol ikke henter paa nytt
+_YF_BATCH = {}
+
+def _yf_download(symbols, **kw):
+    data = yf.download(symbols, interval="1d", group_by="ticker", auto_adjust=True,
+                       progress=False, session=YF_SESSION, threads=True, **kw)
+    if data is None or data.empty:
+        return {}
+    lvl0 = set(data.columns.get_level_values(0))
+    return {sym: data[sym].dropna(how="all") for sym in symbols if sym in lvl0}
+
+def yf_batch_daily(symbols):
+    """Ett yf.download-kall for mange symboler. Returnerer {sym: df} for de som lyktes;
+    resten hentes enkeltvis via kandidatlisten. Symboler med utgaatt cache hentes kun
+    som hale (ett felles kall) og skjoetes paa; feiler skjoeten, hentes hele serien."""
+    out, stale, full = {}, {}, []
+    for sym in dict.fromkeys(symbols):
+        cached = cache_load("yf", sym)
+        if cached is not None:
+            out[sym] = cached
+            continue
+        old = cache_load("yf", sym, max_age=None)
+        if old is not None and len(old):
+            stale[sym] = old
+        else:
+            full.append(sym)
+    if stale:
+        start = (min(df.index[-1] for df in stale.values()) - TAIL_OVERLAP).strftime("%Y-%m-%d")
+        try:
+            tails = _yf_download(list(stale), start=start)
+        except Exception as e:
+            log(f"  yf tail batch error: {e}")
+            tails = {}
+        n_tail = 0
+        for sym, old in stale.items():
+            df = merge_tail(old, normalize_yf_df(tails.get(sym), min_rows=1))
+            if df is None:
+                full.append(sym)
+                continue
+            out[sym] = df; n_tail += 1
+            cache_save("yf", sym, df)
+        log(f"  yf tail batch: {n_tail}/{len(stale)} oppdatert fra {start}")
+    if not full:
+        return out
+    try:
+        data = _yf_download(full, period="max")
+    except Exception as e:
+        log(f"  yf batch error: {e}")
+        return out
+    n_ok = 0
+    for sym, raw in data.items():
+        df = normalize_yf_df(raw)
+        if df is not None:
+            out[sym] = df; n_ok += 1
+            cache_save("yf", sym, df)
+    log(f"  yf batch: {n_ok} ok ({len(full)} downloaded)")
+    return out
+
+# Symboler som feilet alle forsoek i denne kjoeringen (ikke proev igjen med nye sleeps)
+_YF_FAILED = set()
 
 def yf_series_from_candidates(candidates):
+    # _YF_BATCH fungerer som memo per symbol: disk-cache-treff og enkeltvis hentede
+    # serier legges ogsaa der, saa gjentatte oppslag (instrument/trend/regime) er gratis
     for sym in candidates:
+        df = _YF_BATCH.get(sym)
+        if df is None and sym not in _YF_FAILED:
+            df = cache_load("yf", sym)
+            if df is not None:
+                _YF_BATCH[sym] = df
+        if df is not None:
+            return df, sym
+        if sym in _YF_FAILED:
+            continue
+        old = cache_load("yf", sym, max_age=None)
+        if old is not None and len(old):
+            try:
+                tail = yf.Ticker(sym, session=YF_SESSION).history(
+                    start=(old.index[-1] - TAIL_OVERLAP).strftime("%Y-%m-%d"), interval="1d", auto_adjust=True)
+                df = merge_tail(old, normalize_yf_df(tail, min_rows=1))
+            except Exception as e:
+                log(f"  yf tail error {sym}: {e}")
+            if df is not None:
+                log(f"  yf ok (hale): {sym}")
+                cache_save("yf", sym, df)
+                _YF_BATCH[sym] = df
+                return df, sym
         for attempt in range(3):
             try:
-                data = yf.download(sym, period="max", interval="1d",
-                                   auto_adjust=True, progress=False,
-                                   session=YF_SESSION, threads=False)
+                # Ticker.history i stedet for yf.download: download deler global tilstand
+                # (shared._DFS) og er ikke traadsikker naar instrumentene hentes samtidig
+                data = yf.Ticker(sym, session=YF_SESSION).history(
+                    period="max", interval="1d", auto_adjust=True)
                 df = normalize_yf_df(data)
                 if df is not None:
                     log(f"  yf ok: {sym}")
+                    cache_save("yf", sym, df)
+                    _YF_BATCH[sym] = df
                     return df, sym
             except Exception as e:
                 log(f"  yf error {sym} try{attempt+1}: {e}")
             time.sleep(1 + attempt)
+        _YF_FAILED.add(sym)
     return None, None
 
+# FRED-serier hentet i denne kjoeringen (2s10s brukes baade som instrument og i regime)
+_FRED_MEM = {}
+
 def fred_series(series_id):
     if not FRED_KEY:
         return None
+    if series_id in _FRED_MEM:
+        return _FRED_MEM[series_id]
+    cached = cache_load("fred", series_id)
+    if cached is not None:
+        _FRED_MEM[series_id] = cached
+        return cached
+    # Utgaatt cache: hent kun observasjoner fra siste cachede dato, ikke alt fra 1990
+    stale = cache_load("fred", series_id, max_age=None)
+    start = stale.index[-1].strftime("%Y-%m-%d") if stale is not None and len(stale) else "1990-01-01"
     try:
-        r = requests.get(
-            f"{FRED_BASE}?series_id={series_id}&api_key={FRED_KEY}&file_type=json&observation_start=1990-01-01",
-            timeout=60)
+        # ingen fetch_cached her: observation_start flytter seg hver kjoering (ny URL ->
+        # aldri 304), og pickle-cachen + inkrementell start dekker allerede gjenbruken
+        r = FRED_SESSION.get(FRED_BASE, params={"series_id": series_id, "api_key": FRED_KEY,
+                                                "file_type": "json", "observation_start": start},
+                             timeout=FRED_SESSION.request_timeout)
         r.raise_for_status()
-        obs = r.json().get("observations", [])
-        if not obs:
+        obs = loads(r.content).get("observations", [])
+        if not obs and stale is None:
             return None
-        df = pd.DataFrame(obs)[["date","value"]]
-        df["date"]  = pd.to_datetime(df["date"])
-        df["value"] = pd.to_numeric(df["value"], errors="coerce")
-        df = df.set_index("date").sort_index().dropna().asfreq("B").ffill()
-        df["close_use"] = df["value"]
-        df["volume"]    = np.nan
-        log(f"  fred ok: {series_id}")
-        return df[["close_use","volume"]]
+        # observasjonslisten -> to arrays direkte (ingen mellomliggende DataFrame);
+        # FRED bruker "." for manglende verdier -> NaN via coerce
+        new = pd.Series(pd.to_numeric([o["value"] for o in obs], errors="coerce"),
+                        index=pd.to_datetime([o["date"] for o in obs], format="%Y-%m-%d"),
+                        dtype=np.float64)
+        ser = new if stale is None else pd.concat([stale["close_use"], new])
+        ser = ser[~ser.index.duplicated(keep="last")].sort_index().dropna().asfreq("B").ffill()
+        df = pd.DataFrame({"close_use": ser, "volume": np.nan})
+        log(f"  fred ok: {series_id}" + (f" (fra {start})" if stale is not None else ""))
+        cache_save("fred", series_id, df)
+        _FRED_MEM[series_id] = df
+        return df
     except Exception as e:
         log(f"  fred error {series_id}: {e}")
-        return None
+        return stale  # heller gammel serie enn ingen
 
 def fred_2s10s_series():
     y2  = fred_series("DGS2")
     y10 = fred_series("DGS10")
     if y2 is None or y10 is None:
         return None, None
-    df = pd.DataFrame(index=y10.index.union(y2.index))
-    df["y2"]  = y2["close_use"]
-    df["y10"] = y10["close_use"]
-    df = df.sort_index().ffill().dropna()
-    df["close_use"] = df["y10"] - df["y2"]
-    df["volume"]    = np.nan
-    return df[["close_use","volume"]], "FRED:DGS10-DGS2"
+    a10, a2 = y10["close_use"].align(y2["close_use"], join="outer")
+    spread = (a10.ffill() - a2.ffill()).dropna()
+    return pd.DataFrame({"close_use": spread, "volume": np.nan}), "FRED:DGS10-DGS2"
 
 def get_instrument_series(inst):
     if inst["source"] == "yf":
@@ -707,31 +927,51 @@ def get_instrument_series(inst):
     raise ValueError(f"Unknown source: {inst['source']}")
 
 def with_indicators(df):
-    out = df.copy()
-    out["sma36"]  = SMA(out["close_use"], 36)
-    out["sma156"] = SMA(out["close_use"], 156)
-    out["rsi14"]  = RSI(out["close_use"], 14)
-    m,  sl,  h   = MACD_calc(out["close_use"], 12, 26, 9)
-    out["macd"] = m;  out["macd_signal"] = sl;  out["macd_hist"] = h
-    m14, sl14, h14 = MACD_calc(out["close_use"], 14, 28, 9)
-    out["macd14"] = m14; out["macd14_signal"] = sl14; out["macd14_hist"] = h14
-    return out
+    # alle indikatorkolonner bygges fra samme close-serie og festes paa i ett
+    # concat (ingen df.copy() + ni separate kolonne-innsettinger)
+    c = df["close_use"]
+    (m, sl, h), (m14, sl14, h14) = MACD_both(c)
+    ind = pd.DataFrame({
+        "sma36": SMA(c, 36), "sma156": SMA(c, 156), "rsi14": RSI(c, 14),
+        "macd": m, "macd_signal": sl, "macd_hist": h,
+        "macd14": m14, "macd14_signal": sl14, "macd14_hist": h14,
+    }, index=df.index)
+    return pd.concat([df.drop(columns=ind.columns, errors="ignore"), ind], axis=1)
 
 def resample_frames(base_df):
+    # Uke/maaned/kvartal avledes fra samme dagsserie i minnet; kun kolonnene som
+    # brukes videre resamples (yf-rammer har ogsaa open/high/low/dividends/...)
+    base_df   = base_df[["close_use", "volume"]]
     daily     = with_indicators(base_df)
     weekly    = with_indicators(base_df.resample("W-FRI").last().dropna(how="all"))
     monthly   = with_indicators(base_df.resample("ME").last().dropna(how="all"))
     quarterly = with_indicators(base_df.resample("QE").last().dropna(how="all"))
     return daily, weekly, monthly, quarterly
 
+def cached_frames(key, base_df):
+    """resample_frames med disk-cache. Gjenbrukes naar dagsserien er bit-for-bit uendret
+    (helg/helligdag, omkjoeringer samme dag); ellers full omregning. Inkrementell
+    oppdatering fra lagret indikator-tilstand er bevisst ikke brukt: auto_adjust
+    justerer hele historikken ved utbytte/splitt, og siste uke/maaned-bar endres."""
+    base = base_df[["close_use", "volume"]]
+    digest = hashlib.blake2b(base.index.asi8.tobytes() + base.to_numpy().tobytes(),
+                             digest_size=16).hexdigest()
+    fp = (VERSION, FRAMES_CACHE_VERSION, digest)
+    hit = cache_load("frames", key, max_age=None)
+    if hit is not None and hit[0] == fp:
+        return hit[1]
+    frames = resample_frames(base)
+    cache_save("frames", key, (fp, frames))
+    return frames
+
 def frame_summary(df, is_weekly=False):
     if df is None or df.empty:
         return {}
-    last   = float(df["close_use"].iloc[-1])
+    last   = float(df["close_use"].to_numpy()[-1])
     sma36  = df["sma36"].iloc[-1]  if "sma36"  in df.columns else np.nan
     sma156 = df["sma156"].iloc[-1] if "sma156" in df.columns else np.nan
     # 50-perioders MA (beregnes direkte fra close_use, uavhengig av forhaandskolonner)
-    sma50 = df["close_use"].rolling(50).mean().iloc[-1] if len(df) >= 50 else np.nan
+    sma50 = tail_mean(df["close_use"], 50)
 
     def fv(col):
         v = df[col].iloc[-1] if col in df.columns else np.nan
@@ -739,12 +979,11 @@ def frame_summary(df, is_weekly=False):
 
     macd_cross = macd14_cross = None
     if len(df) >= 2:
-        ld  = df["macd"].iloc[-1]   - df["macd_signal"].iloc[-1]
-        pd_ = df["macd"].iloc[-2]   - df["macd_signal"].iloc[-2]
-        macd_cross = bool(ld > 0 and pd_ <= 0)
-        ld14  = df["macd14"].iloc[-1]   - df["macd14_signal"].iloc[-1]
-        pd14  = df["macd14"].iloc[-2]   - df["macd14_signal"].iloc[-2]
-        macd14_cross = bool(ld14 > 0 and pd14 <= 0)
+        # kun de to siste radene trengs: trekk fra paa ndarray i stedet for fire .iloc-oppslag
+        d  = df["macd"].to_numpy()[-2:]   - df["macd_signal"].to_numpy()[-2:]
+        macd_cross = bool(d[1] > 0 and d[0] <= 0)
+        d14 = df["macd14"].to_numpy()[-2:] - df["macd14_signal"].to_numpy()[-2:]
+        macd14_cross = bool(d14[1] > 0 and d14[0] <= 0)
 
     # Trend: er MA stigende? (sammenlign MA naa vs 8 perioder siden)
     sma36_rising = sma156_rising = None
@@ -760,8 +999,10 @@ def frame_summary(df, is_weekly=False):
     # Volum-bekreftelse: siste volum vs 20-perioders snitt
     vol_confirm = None
     if "volume" in df.columns:
-        recent_vol = df["volume"].iloc[-1]
-        avg_vol    = df["volume"].tail(20).mean()
+        v = df["volume"].to_numpy(dtype=np.float64)[-20:]  # ett ndarray-utsnitt for siste + snitt
+        ok = ~np.isnan(v)
+        recent_vol = v[-1]
+        avg_vol    = v[ok].mean() if ok.any() else np.nan   # = tail(20).mean() (hopper over NaN)
         if pd.notna(recent_vol) and pd.notna(avg_vol) and avg_vol > 0:
             vol_confirm = float(recent_vol / avg_vol)
 
@@ -1029,6 +1270,15 @@ BG="#0b0d10"; FG="#e7edf3"; GRID="#27313d"; PANEL="#12161c"
 C_PRICE="#5aa9ff"; C_SMA36="#f5b324"; C_SMA156="#ff6b6b"
 C_RSI="#7ec8e3"; C_SIG="#f5b324"; C_MACD="#5aa9ff"; C_MACD14="#c084fc"
 
+# Agg er valgt over. Lange dagsserier: la Agg forenkle linjer til ~1px presisjon
+# og rasterisere i biter i stedet for ett stort path per linje.
+matplotlib.rcParams["path.simplify"] = True
+matplotlib.rcParams["path.simplify_threshold"] = 1.0
+matplotlib.rcParams["agg.path.chunksize"] = 10000
+# PNG-koding er en stor del av savefig: zlib-nivaa 1 i stedet for 6 gir ~30 % raskere
+# lagring mot ~15 % stoerre filer; ingen Software-metadata
+PNG_SAVE_KW = {"pil_kwargs": {"compress_level": 1}, "metadata": {"Software": None}}
+
 def _style_ax(ax):
     ax.set_facecolor(BG)
     ax.tick_params(colors=FG, labelsize=9)
@@ -1036,6 +1286,77 @@ def _style_ax(ax):
     ax.yaxis.label.set_color(FG)
     ax.grid(True, color=GRID, linewidth=0.5, linestyle=":", alpha=0.6)
 
+# Lange serier tegnes med hvert k-te punkt: ved 120 dpi gir flere punkter enn
+# dette ingen synlig forskjell, men savefig maa rasterisere hvert linjesegment
+PLOT_MAX_POINTS = 1200
+
+def _downsample(n, max_points=PLOT_MAX_POINTS):
+    """Slice med jevn stride for n punkter; siste punkt er alltid med."""
+    if n <= max_points:
+        return slice(None)
+    step = -(-n // max_points)
+    return slice((n - 1) % step, None, step)
+
+# Chart-rendring er CPU-bundet (savefig dominerer): kjoeres i en prosesspool.
+# fork-kontekst fordi dette er et toppnivaa-script uten __main__-vakt (spawn ville
+# kjoert hele rapporten paa nytt i hver arbeider). Uten fork: serielt som foer.
+PLOT_WORKERS = os.cpu_count() or 2
+_PLOT_POOL = None
+_PLOT_FUTS = []
+_PLOT_FORKED = frozenset()  # navn i modulen da arbeiderne ble forket
+
+def _plot_job(fn, args, kwargs):
+    # kjoeres i arbeiderprosessen; send LOG-linjene tilbake til hovedprosessen.
+    # Plott-funksjonene returnerer True kun naar PNG-en faktisk ble skrevet
+    start = len(LOG)
+    ok = fn(*args, **kwargs)
+    return LOG[start:], bool(ok)
+
+def _plot_serial(fn, args, kwargs):
+    fut = Future()
+    fut.set_result(([], bool(fn(*args, **kwargs))))  # logger direkte i hovedprosessen
+    return fut
+
+def submit_plot(fn, *args, **kwargs):
+    """Future med (logglinjer, ok); se plot_ok. Arbeiderne forkes ved foerste kall og
+    kjenner bare funksjoner definert foer det - senere definerte kjoeres serielt."""
+    global _PLOT_POOL, _PLOT_FORKED
+    if _PLOT_POOL is None:
+        try:
+            ctx = multiprocessing.get_context("fork")
+        except ValueError:
+            return _plot_serial(fn, args, kwargs)
+        _PLOT_POOL = ProcessPoolExecutor(max_workers=PLOT_WORKERS, mp_context=ctx)
+        _PLOT_FORKED = frozenset(globals())
+    if fn.__name__ not in _PLOT_FORKED:
+        return _plot_serial(fn, args, kwargs)
+    try:
+        fut = _PLOT_POOL.submit(_plot_job, fn, args, kwargs)
+    except BrokenProcessPool:
+        return _plot_serial(fn, args, kwargs)
+    _PLOT_FUTS.append(fut)
+    return fut
+
+def plot_ok(fut):
+    try:
+        return fut is not None and fut.result()[1]
+    except Exception:
+        return False
+
+def wait_plots():
+    global _PLOT_POOL
+    for fut in _PLOT_FUTS:
+        try:
+            lines = fut.result()[0]
+        except Exception as e:
+            lines = [f"{datetime.now().isoformat()}  plot worker error: {e}"]
+        with _LOG_LOCK:
+            LOG.extend(lines)
+    _PLOT_FUTS.clear()
+    if _PLOT_POOL is not None:
+        _PLOT_POOL.shutdown()
+        _PLOT_POOL = None
+
 def plot_compact(df, title, out_path, ma_label_long="SMA156 (3yr)",
                  ma_short=36, ma_long=156, ma_short_label="SMA36"):
     """Forbedret 4-panel chart: pris+MA, RSI (sonet), MACD, MACD14.
@@ -1045,13 +1366,17 @@ def plot_compact(df, title, out_path, ma_label_long="SMA156 (3yr)",
         s = df["close_use"].dropna()
         if len(s) < 2:
             return
-        fig, axes = plt.subplots(4, 1, sharex=True, figsize=(12, 10.5),
-                                 facecolor=BG, gridspec_kw={"height_ratios":[3.2,1,1,1], "hspace":0.12})
+        # Rammer fra with_indicators har allerede SMA/RSI/MACD beregnet paa full historikk
+        # (samme tall som i summary); kun manglende kolonner regnes ut paa utsnittet
+        def ind(col, fn):
+            return df[col].reindex(s.index) if col in df.columns else fn()
+        fig = Figure(figsize=(12, 10.5), facecolor=BG)
+        axes = fig.subplots(4, 1, sharex=True, gridspec_kw={"height_ratios":[3.2,1,1,1], "hspace":0.12})
         for ax in axes: _style_ax(ax)
 
         # ── Panel 0: Pris + MA ──
-        sma36  = SMA(s, ma_short)
-        sma156 = SMA(s, ma_long)
+        sma36  = ind(f"sma{ma_short}", lambda: SMA(s, ma_short))
+        sma156 = ind(f"sma{ma_long}",  lambda: SMA(s, ma_long))
         axes[0].plot(s.index, s, color=C_PRICE, lw=1.6, label="Close")
         axes[0].plot(s.index, sma36, color=C_SMA36, lw=1.2, label=ma_short_label)
         if sma156.notna().any():
@@ -1067,7 +1392,7 @@ def plot_compact(df, title, out_path, ma_label_long="SMA156 (3yr)",
                        labelcolor=FG, framealpha=0.85, edgecolor=GRID)
 
         # ── Panel 1: RSI med fyllte soner ──
-        rsi = RSI(s)
+        rsi = ind("rsi14", lambda: RSI(s))
         axes[1].axhspan(70, 100, color="#e05050", alpha=0.08)
         axes[1].axhspan(0, 30,   color="#50c878", alpha=0.08)
         axes[1].plot(s.index, rsi, color=C_RSI, lw=1.3)
@@ -1084,7 +1409,10 @@ def plot_compact(df, title, out_path, ma_label_long="SMA156 (3yr)",
                              fontweight="bold", va="center")
 
         # ── Panel 2: MACD 12/26/9 ──
-        m, sig, hist = MACD_calc(s, 12, 26, 9)
+        if {"macd", "macd_signal", "macd_hist"} <= set(df.columns):
+            m, sig, hist = (df[c].reindex(s.index) for c in ("macd", "macd_signal", "macd_hist"))
+        else:
+            m, sig, hist = MACD_calc(s, 12, 26, 9)
         colors2 = ["#50c878" if v >= 0 else "#e05050" for v in hist.fillna(0)]
         bw = max(2, (s.index[-1]-s.index[0]).days/len(s)*0.7) if len(s)>1 else 3
         axes[2].bar(s.index, hist, color=colors2, alpha=0.5, width=bw)
@@ -1096,7 +1424,10 @@ def plot_compact(df, title, out_path, ma_label_long="SMA156 (3yr)",
                        labelcolor=FG, framealpha=0.85, edgecolor=GRID)
 
         # ── Panel 3: MACD14 14/28/9 ──
-        m14, sig14, hist14 = MACD_calc(s, 14, 28, 9)
+        if {"macd14", "macd14_signal", "macd14_hist"} <= set(df.columns):
+            m14, sig14, hist14 = (df[c].reindex(s.index) for c in ("macd14", "macd14_signal", "macd14_hist"))
+        else:
+            m14, sig14, hist14 = MACD_calc(s, 14, 28, 9)
         colors3 = ["#50c878" if v >= 0 else "#e05050" for v in hist14.fillna(0)]
         axes[3].bar(s.index, hist14, color=colors3, alpha=0.5, width=bw)
         axes[3].plot(s.index, m14,   color=C_MACD14, lw=1.1, label="MACD14")
@@ -1109,9 +1440,9 @@ def plot_compact(df, title, out_path, ma_label_long="SMA156 (3yr)",
         axes[3].xaxis.set_major_locator(locator)
         axes[3].xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
 
-        plt.tight_layout(pad=0.8)
-        plt.savefig(out_path, dpi=125, facecolor=BG, bbox_inches="tight")
-        plt.close(fig)
+        fig.tight_layout(pad=0.8)
+        fig.savefig(out_path, dpi=125, facecolor=BG, bbox_inches="tight", **PNG_SAVE_KW)
+        return True
     except Exception as e:
         log(f"plot error {title}: {e}")
 
@@ -1122,8 +1453,8 @@ def plot_series_3panel(series, title, out_path, ma_n=36, ma_label="36"):
         s = series.dropna()
         if len(s) < 5:
             return
-        fig, axes = plt.subplots(3, 1, sharex=True, figsize=(12, 8),
-                                 facecolor=BG, gridspec_kw={"height_ratios":[3,1,1], "hspace":0.12})
+        fig = Figure(figsize=(12, 8), facecolor=BG)
+        axes = fig.subplots(3, 1, sharex=True, gridspec_kw={"height_ratios":[3,1,1], "hspace":0.12})
         for ax in axes: _style_ax(ax)
 
         ma = SMA(s, ma_n)
@@ -1162,31 +1493,64 @@ def plot_series_3panel(series, title, out_path, ma_n=36, ma_label="36"):
         axes[2].xaxis.set_major_locator(locator)
         axes[2].xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
 
-        plt.tight_layout(pad=0.8)
-        plt.savefig(out_path, dpi=125, facecolor=BG, bbox_inches="tight")
-        plt.close(fig)
+        fig.tight_layout(pad=0.8)
+        fig.savefig(out_path, dpi=125, facecolor=BG, bbox_inches="tight", **PNG_SAVE_KW)
+        return True
     except Exception as e:
         log(f"plot_series_3panel error {title}: {e}")
 
+def plot_macro_3m(q, title, out_path, zero_line=False):
+    """Enkelt 3-maaneders linjechart for makro-serie (yield-kurve, Fed, yield).
+    q er allerede resamplet til kvartal (sjekkes i hovedprosessen, se under)."""
+    try:
+        fig = Figure(figsize=(11, 4.5), facecolor=BG)
+        ax = fig.subplots()
+        _style_ax(ax)
+        ax.plot(q.index, q.values, color=C_PRICE, lw=1.8)
+        ma = SMA(q, 8)
+        if ma.notna().any():
+            ax.plot(q.index, ma.values, color=C_SMA36, lw=1.1, ls="--", label="8Q MA")
+        if zero_line:
+            ax.axhline(0, color="#e05050", lw=1.0, ls="--", alpha=0.7)
+        last_v = q.iloc[-1]
+        ax.scatter([q.index[-1]], [last_v], color=C_PRICE, s=30, zorder=5)
+        ax.annotate(f"{last_v:,.2f}", xy=(q.index[-1], last_v), xytext=(6,0),
+                    textcoords="offset points", color=C_PRICE, fontsize=10,
+                    fontweight="bold", va="center")
+        ax.set_title(title, fontsize=12, color=FG, fontweight="bold", pad=8)
+        ax.legend(loc="upper left", fontsize=8.5, facecolor=PANEL, labelcolor=FG,
+                  framealpha=0.85, edgecolor=GRID)
+        locator = mdates.AutoDateLocator()
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+        fig.tight_layout(pad=0.8)
+        fig.savefig(out_path, dpi=125, facecolor=BG, bbox_inches="tight", **PNG_SAVE_KW)
+        return True
+    except Exception as e:
+        log(f"macro chart error {title}: {e}")
+
 def plot_ratio(df_num, df_den, label, out_path):
     try:
-        combined = pd.DataFrame({"num": df_num["close_use"], "den": df_den["close_use"]}).dropna()
-        if len(combined) < 50: return
-        combined["ratio"] = combined["num"] / combined["den"]
-        weekly = combined["ratio"].resample("W-FRI").last().dropna()
+        ratio = ratio_of(df_num["close_use"], df_den["close_use"])
+        if len(ratio) < 50: return
+        weekly = ratio.resample("W-FRI").last().dropna()
         if len(weekly) < 36: return
         ws = pd.Series(weekly.values, index=weekly.index)
+        # indikatorer paa full serie, deretter tynnes kun det som tegnes
+        sma36 = SMA(ws, 36)
+        rsi = RSI(ws)
+        ds = _downsample(len(ws))
+        x = weekly.index[ds]
 
-        fig, axes = plt.subplots(2,1, sharex=True, figsize=(11,6), facecolor=BG)
+        fig = Figure(figsize=(11,6), facecolor=BG)
+        axes = fig.subplots(2,1, sharex=True)
         for ax in axes: _style_ax(ax)
-        axes[0].plot(weekly.index, weekly.values, color=C_SMA36, lw=1.2, label=label)
-        sma36 = SMA(ws, 36)
+        axes[0].plot(x, weekly.values[ds], color=C_SMA36, lw=1.2, label=label)
         if sma36.notna().any():
-            axes[0].plot(weekly.index, sma36.values, color=C_PRICE, lw=0.9, ls="--", label="SMA36")
+            axes[0].plot(x, sma36.values[ds], color=C_PRICE, lw=0.9, ls="--", label="SMA36")
         axes[0].set_title(f"Ratio: {label}", fontsize=10, color=FG)
         axes[0].legend(fontsize=7, facecolor=BG, labelcolor=FG, framealpha=0.7)
-        rsi = RSI(ws)
-        axes[1].plot(weekly.index, rsi.values, color=C_RSI, lw=1.0)
+        axes[1].plot(x, rsi.values[ds], color=C_RSI, lw=1.0)
         axes[1].axhline(70, color="#e05050", ls="--", lw=0.7)
         axes[1].axhline(30, color="#50c878", ls="--", lw=0.7)
         axes[1].set_ylim(0,100)
@@ -1194,33 +1558,38 @@ def plot_ratio(df_num, df_den, label, out_path):
         locator = mdates.AutoDateLocator()
         axes[1].xaxis.set_major_locator(locator)
         axes[1].xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
-        plt.tight_layout(pad=0.7)
-        plt.savefig(out_path, dpi=120, facecolor=BG)
-        plt.close(fig)
+        fig.tight_layout(pad=0.7)
+        fig.savefig(out_path, dpi=120, facecolor=BG, **PNG_SAVE_KW)
         log(f"  ratio: {label}")
+        return True
     except Exception as e:
         log(f"  ratio error {label}: {e}")
 
 # ─── NEWS ──────────────────────────────────────────────────────
-def last_n_days_posts(url, days=4):
-    from bs4 import BeautifulSoup
+def last_n_days_posts(url, days=4, max_items=20):
+    # iterparse paa <item> med tidlig stopp: kun de foerste max_items bygges, og hvert
+    # element ryddes etter bruk (konstant minne uansett feedstoerrelse).
+    # pubDate -> epoch-sekunder i en liste; tidssone og cutoff gjoeres vektorisert etterpaa
+    from lxml import etree
+    from email.utils import parsedate_tz
+    from calendar import timegm
     out = []
     try:
-        r = requests.get(url, timeout=30); r.raise_for_status()
-        soup  = BeautifulSoup(r.text, "lxml")
-        items = soup.find_all("item")
-        cutoff = pd.Timestamp(NOW.date()) - pd.Timedelta(days=days)
-        for it in items[:20]:
-            tn = it.find("title"); ln = it.find("link")
-            if not tn or not ln: continue
-            title = tn.get_text(strip=True); link = ln.get_text(strip=True)
-            pub = it.find("pubdate")
-            ts  = pd.to_datetime(pub.get_text(strip=True)) if pub else None
-            if ts is not None:
-                if ts.tzinfo is None: ts = ts.tz_localize("UTC")
-                if ts.tz_convert(TZ) < pd.Timestamp(cutoff, tz=TZ): continue
-            out.append({"title": title, "link": link,
-                        "published": ts.tz_convert(TZ).isoformat() if ts else ""})
+        raw = fetch_cached(NEWS_SESSION, url, HTTP_CACHE)
+        titles, links, epochs = [], [], []
+        for i, (_, el) in enumerate(etree.iterparse(BytesIO(raw), tag="item", recover=True)):
+            if i >= max_items: break
+            title = (el.findtext("title") or "").strip(); link = (el.findtext("link") or "").strip()
+            tt = parsedate_tz((el.findtext("pubDate") or "").strip())
+            el.clear()
+            if not title or not link: continue
+            titles.append(title); links.append(link)
+            epochs.append(timegm(tt) - (tt[9] or 0) if tt else np.nan)  # uten offset: UTC
+        ts = pd.to_datetime(np.array(epochs, dtype=np.float64), unit="s", utc=True).tz_convert(TZ)
+        cutoff = pd.Timestamp(NOW.date(), tz=TZ) - pd.Timedelta(days=days)
+        keep = ~(ts < cutoff)  # NaT (mangler dato) beholdes som foer
+        out = [{"title": t, "link": l, "published": "" if p is pd.NaT else p.isoformat()}
+               for t, l, p, k in zip(titles, links, ts, keep) if k]
     except Exception as e:
         log(f"rss error {url}: {e}")
     return out
@@ -1239,11 +1608,28 @@ summary = {
     ],
 }
 
+# Nettverkshenting er I/O-bundet: hent alle instrumenter samtidig foerst,
+# deretter indikatorer/score/plott serielt i fast rekkefoelge.
+_all_insts = [inst for g in INSTRUMENT_GROUPS for inst in g["instruments"]]
+log(f"Fetching {len(_all_insts)} instruments ({FETCH_WORKERS} workers)...")
+# FRED-seriene hentes samtidig i bakgrunnen mens yf-batchen laster ned (memo i fred_series)
+_fred_ex = ThreadPoolExecutor(max_workers=len(FRED_IDS))
+_fred_futs = [_fred_ex.submit(fred_series, sid) for sid in FRED_IDS]
+# Foerstekandidatene i ett batch-kall; kun de som mangler faller til enkeltvis henting
+# (inkl. trend-oversikt og regime-serien for 10yr, som ellers hentes enkeltvis senere)
+TEN_CANDIDATES = ["UTEN", "^TNX", "IEF"]
+_YF_BATCH.update(yf_batch_daily(
+    [i["candidates"][0] for i in _all_insts if i["source"] == "yf"]
+    + [c[0] for c in TREND_TICKERS.values()] + TEN_CANDIDATES[:1]))
+for _f in _fred_futs: _f.result()
+_fred_ex.shutdown()
+with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as _ex:
+    fetched = dict(zip((i["id"] for i in _all_insts), _ex.map(get_instrument_series, _all_insts)))
+
 for group in INSTRUMENT_GROUPS:
     for inst in group["instruments"]:
         iid = inst["id"]
-        log(f"Fetching {iid}...")
-        df, resolved = get_instrument_series(inst)
+        df, resolved = fetched[iid]
 
         entry = {
             "id": iid, "display_name": inst["label"], "symbol_label": inst["symbol_label"],
@@ -1258,7 +1644,7 @@ for group in INSTRUMENT_GROUPS:
             summary["assets"][iid] = entry; log(f"  MISSING: {iid}"); continue
 
         raw_cache[iid] = df
-        daily, weekly, monthly, quarterly = resample_frames(df)
+        daily, weekly, monthly, quarterly = cached_frames(iid, df)
         entry["frames"]["daily"]     = frame_summary(daily,     is_weekly=False)
         entry["frames"]["weekly"]    = frame_summary(weekly,    is_weekly=True)
         entry["frames"]["monthly"]   = frame_summary(monthly,   is_weekly=False)
@@ -1275,16 +1661,16 @@ for group in INSTRUMENT_GROUPS:
         entry["northstar_score_points"] = score_points
 
         if not weekly.empty:
-            plot_compact(weekly.tail(400), f"{inst['label']} ({inst['symbol_label']}) - weekly",
-                         CHARTS / f"{iid}_weekly_compact.png")
+            submit_plot(plot_compact, weekly.tail(400), f"{inst['label']} ({inst['symbol_label']}) - weekly",
+                        CHARTS / f"{iid}_weekly_compact.png")
         if not monthly.empty:
-            plot_compact(monthly.tail(240), f"{inst['label']} ({inst['symbol_label']}) - monthly",
-                         CHARTS / f"{iid}_monthly_compact.png",
-                         ma_short=12, ma_long=36, ma_short_label="SMA12 (1aar)", ma_label_long="SMA36 (3aar)")
+            submit_plot(plot_compact, monthly.tail(240), f"{inst['label']} ({inst['symbol_label']}) - monthly",
+                        CHARTS / f"{iid}_monthly_compact.png",
+                        ma_short=12, ma_long=36, ma_short_label="SMA12 (1aar)", ma_label_long="SMA36 (3aar)")
         if not quarterly.empty and len(quarterly) >= 8:
-            plot_compact(quarterly.tail(120), f"{inst['label']} ({inst['symbol_label']}) - 3-maaneders",
-                         CHARTS / f"{iid}_quarterly_compact.png",
-                         ma_short=4, ma_long=12, ma_short_label="SMA4 (1aar)", ma_label_long="SMA12 (3aar)")
+            submit_plot(plot_compact, quarterly.tail(120), f"{inst['label']} ({inst['symbol_label']}) - 3-maaneders",
+                        CHARTS / f"{iid}_quarterly_compact.png",
+                        ma_short=4, ma_long=12, ma_short_label="SMA4 (1aar)", ma_label_long="SMA12 (3aar)")
 
         summary["assets"][iid] = entry
         log(f"  OK: {iid} score={score}")
@@ -1296,10 +1682,11 @@ for group in INSTRUMENT_GROUPS:
 def _vs_gold_state(ratio, ma_window=36, lookback=9):
     if ratio is None or len(ratio) < ma_window + 4:
         return None
-    ma = ratio.rolling(ma_window).mean()
     last = float(ratio.iloc[-1])
-    ma_now = float(ma.iloc[-1]) if pd.notna(ma.iloc[-1]) else None
-    ma_prev = float(ma.iloc[-lookback]) if (len(ma) >= lookback and pd.notna(ma.iloc[-lookback])) else None
+    ma_now = tail_mean(ratio, ma_window)
+    ma_now = ma_now if pd.notna(ma_now) else None
+    ma_prev = tail_mean(ratio.iloc[:len(ratio) - lookback + 1], ma_window)  # = MA lookback-1 perioder tilbake
+    ma_prev = ma_prev if pd.notna(ma_prev) else None
     if ma_now is None:
         return None
     above = last > ma_now
@@ -1321,12 +1708,11 @@ for iid, a in summary["assets"].items():
         a["vs_gold"] = None; a["vs_gold_m"] = None; a["vs_gold_q"] = None
         continue
     try:
-        comb = pd.DataFrame({"i": inst_df["close_use"], "g": gold_df["close_use"]}).dropna()
-        if len(comb) < 60:
+        ratio_full = ratio_of(inst_df["close_use"], gold_df["close_use"])
+        if len(ratio_full) < 60:
             a["vs_gold"] = None; a["vs_gold_m"] = None; a["vs_gold_q"] = None
             a["gold_beat"] = None
             continue
-        ratio_full = (comb["i"]/comb["g"])
         rW = ratio_full.resample("W-FRI").last().dropna()
         rM = ratio_full.resample("ME").last().dropna()
         rQ = ratio_full.resample("QE").last().dropna()
@@ -1336,9 +1722,9 @@ for iid, a in summary["assets"].items():
         # Grunndefinisjon: slaar gull = ratio over 50MA paa 1M ELLER 3M.
         def _o50(r):
             if len(r) < 52: return None
-            ma = r.rolling(50).mean()
-            if pd.isna(ma.iloc[-1]): return None
-            return bool(float(r.iloc[-1]) > float(ma.iloc[-1]))
+            ma = tail_mean(r, 50)
+            if pd.isna(ma): return None
+            return bool(float(r.iloc[-1]) > ma)
         om = _o50(rM); oq = _o50(rQ)
         tf = []
         if om: tf.append("1M")
@@ -1392,7 +1778,7 @@ regime = {}
 yc_df, _yc_src = fred_2s10s_series()
 if yc_df is None:
     log("  regime: 2s10s utilgjengelig (FRED-noekkel mangler?)")
-ten_df, _ten_src = yf_series_from_candidates(["UTEN", "^TNX", "IEF"])
+ten_df, _ten_src = yf_series_from_candidates(TEN_CANDIDATES)
 if ten_df is None:
     log("  regime: 10yr UST utilgjengelig")
 
@@ -1435,8 +1821,8 @@ else:
 # 3) 10yr yield-retning (Continuum): over/under stigende?
 if ten_df is not None and not ten_df.empty:
     ten_last = float(ten_df["close_use"].iloc[-1])
-    ten_ma = ten_df["close_use"].rolling(200).mean()
-    ten_ma_last = float(ten_ma.iloc[-1]) if pd.notna(ten_ma.iloc[-1]) else None
+    ten_ma = tail_mean(ten_df["close_use"], 200)
+    ten_ma_last = ten_ma if pd.notna(ten_ma) else None
     if ten_ma_last:
         if ten_last > ten_ma_last:
             regime["yields"] = {"label": f"Stigende ({ten_last:.2f})", "col": "#e05050",
@@ -1457,10 +1843,10 @@ def _over_50ma(ratio_series, resample_rule):
     r = ratio_series.resample(resample_rule).last().dropna()
     if len(r) < 52:
         return None, None
-    ma = r.rolling(50).mean()
-    if pd.isna(ma.iloc[-1]):
+    ma_now = tail_mean(r, 50)
+    if pd.isna(ma_now):
         return None, None
-    last = float(r.iloc[-1]); ma_now = float(ma.iloc[-1])
+    last = float(r.iloc[-1])
     return (last > ma_now), ((last-ma_now)/ma_now*100)
 
 def _beats_gold_50ma(iid):
@@ -1468,10 +1854,9 @@ def _beats_gold_50ma(iid):
     nd = raw_cache.get(iid); gd = raw_cache.get("GLD")
     if nd is None or gd is None:
         return None, None, None
-    comb = pd.DataFrame({"n": nd["close_use"], "g": gd["close_use"]}).dropna()
-    if len(comb) < 80:
+    ratio = ratio_of(nd["close_use"], gd["close_use"])
+    if len(ratio) < 80:
         return None, None, None
-    ratio = comb["n"]/comb["g"]
     over_m, _ = _over_50ma(ratio, "ME")
     over_q, _ = _over_50ma(ratio, "QE")
     if over_m is None and over_q is None:
@@ -1500,61 +1885,38 @@ if tot_r > 0:
         "beats": rot_beats, "loses": rot_loses}
 
 # ─── MAKRO-REGIME CHARTS (3-maaneders) ─────────────────────────
-def plot_macro_3m(series, title, out_path, zero_line=False):
-    """Enkelt 3-maaneders linjechart for makro-serie (yield-kurve, Fed, yield)."""
-    try:
-        q = series.resample("QE").last().dropna()
-        if len(q) < 4:
-            return False
-        fig, ax = plt.subplots(figsize=(11, 4.5), facecolor=BG)
-        _style_ax(ax)
-        ax.plot(q.index, q.values, color=C_PRICE, lw=1.8)
-        ma = q.rolling(8).mean()
-        if ma.notna().any():
-            ax.plot(q.index, ma.values, color=C_SMA36, lw=1.1, ls="--", label="8Q MA")
-        if zero_line:
-            ax.axhline(0, color="#e05050", lw=1.0, ls="--", alpha=0.7)
-        last_v = q.iloc[-1]
-        ax.scatter([q.index[-1]], [last_v], color=C_PRICE, s=30, zorder=5)
-        ax.annotate(f"{last_v:,.2f}", xy=(q.index[-1], last_v), xytext=(6,0),
-                    textcoords="offset points", color=C_PRICE, fontsize=10,
-                    fontweight="bold", va="center")
-        ax.set_title(title, fontsize=12, color=FG, fontweight="bold", pad=8)
-        ax.legend(loc="upper left", fontsize=8.5, facecolor=PANEL, labelcolor=FG,
-                  framealpha=0.85, edgecolor=GRID)
-        locator = mdates.AutoDateLocator()
-        ax.xaxis.set_major_locator(locator)
-        ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
-        plt.tight_layout(pad=0.8)
-        plt.savefig(out_path, dpi=125, facecolor=BG, bbox_inches="tight")
-        plt.close(fig)
-        return True
-    except Exception as e:
-        log(f"macro chart error {title}: {e}")
-        return False
+# Chart-lenker i regime settes foerst etter wait_plots(), og kun for PNG-er som faktisk
+# ble skrevet: (future, seksjon, noekkel, sti)
+_REGIME_CHARTS = []
 
-if yc_df is not None and not yc_df.empty:
-    if plot_macro_3m(yc_df["close_use"], "Yield-kurve 2s10s - 3-maaneders", CHARTS/"macro_2s10s.png", zero_line=True):
-        regime.setdefault("yield_curve",{})["chart"] = "charts/macro_2s10s.png"
-if fed_df is not None and not fed_df.empty:
-    if plot_macro_3m(fed_df["close_use"], "Fed-balanse (WALCL) - 3-maaneders", CHARTS/"macro_fed.png"):
-        regime.setdefault("fed_liquidity",{})["chart"] = "charts/macro_fed.png"
+def submit_macro_3m(df, title, name, zero_line=False):
+    # kvartalsserien bygges her; arbeideren faar kun de faa punktene som tegnes
+    if df is None or df.empty:
+        return None
+    q = df["close_use"].resample("QE").last().dropna()
+    if len(q) < 4:
+        return None
+    return submit_plot(plot_macro_3m, q, title, CHARTS/name, zero_line=zero_line)
+
+_REGIME_CHARTS.append((submit_macro_3m(yc_df, "Yield-kurve 2s10s - 3-maaneders", "macro_2s10s.png", zero_line=True),
+                       "yield_curve", "chart", "charts/macro_2s10s.png"))
+_REGIME_CHARTS.append((submit_macro_3m(fed_df, "Fed-balanse (WALCL) - 3-maaneders", "macro_fed.png"),
+                       "fed_liquidity", "chart", "charts/macro_fed.png"))
 
 # Kapitalrotasjon-chart: GLD/ACWI (Northstar sin kjerne-ratio) M + 3M
 acwi_df = raw_cache.get("ACWI")
 if gold_df is not None and acwi_df is not None:
     try:
-        rc = pd.DataFrame({"g": gold_df["close_use"], "a": acwi_df["close_use"]}).dropna()
-        if len(rc) > 200:
-            rot_ratio = (rc["g"]/rc["a"])
+        rot_ratio = ratio_of(gold_df["close_use"], acwi_df["close_use"])
+        if len(rot_ratio) > 200:
             mdf = pd.DataFrame({"close_use": rot_ratio.resample("ME").last().dropna(), "volume": np.nan})
             qdf = pd.DataFrame({"close_use": rot_ratio.resample("QE").last().dropna(), "volume": np.nan})
-            plot_compact(mdf.tail(180), "GLD/ACWI - maanedlig", CHARTS/"rotation_gld_acwi_m.png",
-                         ma_short=12, ma_long=36, ma_short_label="SMA12 (1aar)", ma_label_long="SMA36 (3aar)")
-            plot_compact(qdf.tail(120), "GLD/ACWI - 3-maaneders", CHARTS/"rotation_gld_acwi_q.png",
-                         ma_short=4, ma_long=12, ma_short_label="SMA4 (1aar)", ma_label_long="SMA12 (3aar)")
-            regime.setdefault("rotation",{})["chart_m"] = "charts/rotation_gld_acwi_m.png"
-            regime.setdefault("rotation",{})["chart_q"] = "charts/rotation_gld_acwi_q.png"
+            fm = submit_plot(plot_compact, mdf.tail(180), "GLD/ACWI - maanedlig", CHARTS/"rotation_gld_acwi_m.png",
+                             ma_short=12, ma_long=36, ma_short_label="SMA12 (1aar)", ma_label_long="SMA36 (3aar)")
+            fq = submit_plot(plot_compact, qdf.tail(120), "GLD/ACWI - 3-maaneders", CHARTS/"rotation_gld_acwi_q.png",
+                             ma_short=4, ma_long=12, ma_short_label="SMA4 (1aar)", ma_label_long="SMA12 (3aar)")
+            _REGIME_CHARTS.append((fm, "rotation", "chart_m", "charts/rotation_gld_acwi_m.png"))
+            _REGIME_CHARTS.append((fq, "rotation", "chart_q", "charts/rotation_gld_acwi_q.png"))
     except Exception as e:
         log(f"rotation chart error: {e}")
 
@@ -1565,10 +1927,9 @@ ratio_results = {}
 def ratio_metrics(df_num, df_den):
     """Northstar-score for ratio (samme modell), + ukentlig score-historikk."""
     try:
-        combined = pd.DataFrame({"num": df_num["close_use"], "den": df_den["close_use"]}).dropna()
-        if len(combined) < 200:
+        ratio = ratio_of(df_num["close_use"], df_den["close_use"])
+        if len(ratio) < 200:
             return None
-        ratio = (combined["num"] / combined["den"])
         score, points, frames = score_synthetic_series(ratio)
         if score is None:
             return None
@@ -1589,7 +1950,7 @@ for (num_id, den_id, label) in RATIO_PAIRS:
     if num_id in raw_cache and den_id in raw_cache:
         rid = f"RATIO_{num_id}_{den_id}"
         out_path = CHARTS / f"{rid}_weekly_compact.png"
-        plot_ratio(raw_cache[num_id], raw_cache[den_id], label, out_path)
+        submit_plot(plot_ratio, raw_cache[num_id][["close_use"]], raw_cache[den_id][["close_use"]], label, out_path)
         rm = ratio_metrics(raw_cache[num_id], raw_cache[den_id])
         ratio_results[rid] = {"label": label, "numerator": num_id, "denominator": den_id,
                               "chart_weekly": f"charts/{rid}_weekly_compact.png",
@@ -1597,10 +1958,12 @@ for (num_id, den_id, label) in RATIO_PAIRS:
 
 # News
 log("News...")
-news = {"nftrh": last_n_days_posts("https://nftrh.com/blog/feed/"),
-        "northstar": last_n_days_posts("https://northstarbadcharts.com/feed/")}
-with open(NEWS_DIR/"news.json","w",encoding="utf-8") as f:
-    json.dump(news, f, ensure_ascii=False, indent=2)
+prune_cache(HTTP_CACHE, HTTP_CACHE_MAX_AGE)  # inkl. gamle FRED-oppfoeringer fra foer
+NEWS_FEEDS = {"nftrh": "https://nftrh.com/blog/feed/",
+              "northstar": "https://northstarbadcharts.com/feed/"}
+with ThreadPoolExecutor(len(NEWS_FEEDS)) as _ex:  # feedene hentes samtidig
+    news = dict(zip(NEWS_FEEDS, _ex.map(last_n_days_posts, NEWS_FEEDS.values())))
+save_json(NEWS_DIR/"news.json", news)
 
 # Portfolio brief
 def build_portfolio_brief(assets_dict, sector_sum):
@@ -1668,7 +2031,7 @@ def bootstrap_history_from_pages():
         # hent manifest hvis det finnes
         r = requests.get(f"{PAGES_HIST_BASE}/manifest.json", timeout=20)
         if r.status_code == 200:
-            dates = r.json().get("dates", [])
+            dates = loads(r.content).get("dates", [])
             for d in dates[-42:]:
                 rr = requests.get(f"{PAGES_HIST_BASE}/{d}.json", timeout=15)
                 if rr.status_code == 200:
@@ -1687,20 +2050,18 @@ today_snapshot = {
                if not a.get("missing_data") and a.get("northstar_score") is not None},
     "sector_scores": {sec: ss["avg_score"] for sec, ss in sector_summary.items()},
 }
-with open(HIST_DIR / f"{NOW.strftime('%Y-%m-%d')}.json", "w", encoding="utf-8") as f:
-    json.dump(today_snapshot, f, ensure_ascii=False, indent=2)
+save_json(HIST_DIR / f"{NOW.strftime('%Y-%m-%d')}.json", today_snapshot)
 
 # Skriv manifest over alle historikk-datoer
 all_dates = sorted([p.stem for p in HIST_DIR.glob("*.json") if p.stem != "manifest"])
-with open(HIST_DIR / "manifest.json", "w", encoding="utf-8") as f:
-    json.dump({"dates": all_dates}, f, ensure_ascii=False, indent=2)
+save_json(HIST_DIR / "manifest.json", {"dates": all_dates})
 
 # Les siste 42 dager (ca 6 uker) historikk
 history_files = sorted(HIST_DIR.glob("*.json"))
 history = []
 for hf in history_files[-42:]:
     try:
-        history.append(json.loads(hf.read_text(encoding="utf-8")))
+        history.append(loads(hf.read_bytes()))
     except Exception:
         pass
 
@@ -1751,8 +2112,10 @@ rotation.sort(key=lambda x: -x["score"])
 # ─── TREND-OVERSIKT: hent tickere, bygg ratioer, score + charts ──
 log("Trend-oversikt: henter tickere...")
 trend_price = {}
-for key, candidates in TREND_TICKERS.items():
-    df, resolved = yf_series_from_candidates(candidates)
+# Tickere som ikke allerede ligger i minnet hentes samtidig (I/O-bundet)
+with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as _ex:
+    _trend_fetched = list(_ex.map(yf_series_from_candidates, TREND_TICKERS.values()))
+for key, (df, resolved) in zip(TREND_TICKERS, _trend_fetched):
     if df is not None and not df.empty:
         s = df["close_use"].copy()
         if key == "NOK" and NOK_INVERT:
@@ -1767,10 +2130,10 @@ for (num_key, den_key, label) in TREND_RATIOS:
     if num_key not in trend_price or den_key not in trend_price:
         log(f"  hopper over {label} (mangler data)")
         continue
-    combined = pd.DataFrame({"num": trend_price[num_key], "den": trend_price[den_key]}).dropna()
-    if len(combined) < 200:
+    ratio = ratio_of(trend_price[num_key], trend_price[den_key])
+    if len(ratio) < 200:
         continue
-    ratio = (combined["num"] / combined["den"]).dropna()
+    ratio = ratio.dropna()
     score, points, frames = score_ratio_series(ratio)
     if score is None:
         continue
@@ -1817,10 +2180,9 @@ def _rel_perf(num_id, den_df):
     num_df = raw_cache.get(num_id)
     if num_df is None or den_df is None:
         return None
-    comb = pd.DataFrame({"n": num_df["close_use"], "d": den_df["close_use"]}).dropna()
-    if len(comb) < 80:
+    ratio = ratio_of(num_df["close_use"], den_df["close_use"])
+    if len(ratio) < 80:
         return None
-    ratio = (comb["n"]/comb["d"])
     m = ratio.resample("ME").last().dropna()
     if len(m) < 6:
         return None
@@ -1901,10 +2263,9 @@ def _flow_signal(num_id, den_id, label, note):
     nd = raw_cache.get(num_id); dd = raw_cache.get(den_id)
     if nd is None or dd is None:
         return
-    comb = pd.DataFrame({"n": nd["close_use"], "d": dd["close_use"]}).dropna()
-    if len(comb) < 80:
+    ratio = ratio_of(nd["close_use"], dd["close_use"])
+    if len(ratio) < 80:
         return
-    ratio = (comb["n"]/comb["d"])
     r = ratio.resample("ME").last().dropna()
     if len(r) < 4:
         return
@@ -1913,9 +2274,9 @@ def _flow_signal(num_id, den_id, label, note):
     q = ratio.resample("QE").last().dropna()
     over_50ma_3m = None
     if len(q) >= 52:
-        maq = q.rolling(50).mean()
-        if pd.notna(maq.iloc[-1]):
-            over_50ma_3m = float(q.iloc[-1]) > float(maq.iloc[-1])
+        maq = tail_mean(q, 50)
+        if pd.notna(maq):
+            over_50ma_3m = float(q.iloc[-1]) > maq
     risk_on = chg_3m > 0 and bool(over_50ma_3m)
     money_flow.append({
         "label": label, "chg_3m": round(chg_3m, 1),
@@ -1999,12 +2360,14 @@ index = {"generated_local": NOW.isoformat(), "version": VERSION, "summary": summ
          "cyclical_pairs": cyclical_pairs, "money_flow": money_flow,
          "genre_strength": genre_strength,
          "notes": {"instrument_count": len(ALL_IDS)}}
-with open(DOCS/"index.json","w",encoding="utf-8") as f:
-    json.dump(index, f, ensure_ascii=False, indent=2)
-
-files = sorted([f"charts/{fn.name}" for fn in CHARTS.glob("*.png")])
-with open(DOCS/"filelist.json","w",encoding="utf-8") as f:
-    json.dump({"charts":files}, f, ensure_ascii=False, indent=2)
+wait_plots()  # alle charts maa vaere skrevet foer regime-lenkene og filelist
+for fut, sect, key, path in _REGIME_CHARTS:
+    if plot_ok(fut):
+        regime.setdefault(sect, {})[key] = path
+save_json(DOCS/"index.json", index)
+
+files = list_files(CHARTS, ".png", prefix="charts/")
+save_json(DOCS/"filelist.json", {"charts":files})
 
 # ─── HTML ──────────────────────────────────────────────────────
 def fmt(v, d=1): return f"{v:.{d}f}" if isinstance(v,float) and not math.isnan(v) else "-"
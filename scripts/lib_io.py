@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import json, os
+from pathlib import Path
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # CI uten wheel: stdlib json
+    orjson = None
+
+# publiserte speil av docs/ (gh-pages); delt mellom export_for_chatgpt og postprocess_report
+RAW_BASE = "https://raw.githubusercontent.com/regg92s-hub/market-daily-report/gh-pages"
+JSD_BASE = "https://cdn.jsdelivr.net/gh/regg92s-hub/market-daily-report@gh-pages"
+PAG_BASE = "https://regg92s-hub.github.io/market-daily-report"
+
+def loads(raw: Any) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass  # f.eks. NaN skrevet av stdlib json; la stdlib prove
+    return json.loads(raw)
+
+def dumps(obj: Any, indent: bool = False, sort_keys: bool = False) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=(orjson.OPT_INDENT_2 if indent else 0)
+                                | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+                                | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            pass  # typer orjson ikke kjenner; stdlib gir samme feil/oppfoersel som foer
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None,
+                      sort_keys=sort_keys).encode("utf-8")
+
+def load_json(path: Any, default: Any = None) -> Any:
+    fallback = {} if default is None else default
+    try:
+        raw = Path(path).read_bytes()
+    except OSError:  # FileNotFoundError, IsADirectoryError, ...
+        return fallback
+    if not raw.strip():
+        return fallback
+    try:
+        return loads(raw)
+    except Exception:
+        return fallback
+
+def atomic_write_bytes(path: Any, data: bytes) -> None:
+    # skriv til .tmp og os.replace: lesere (Pages/jsdelivr) ser aldri en halvskrevet fil
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+def save_json(path: Any, obj: Any, indent: bool = True) -> None:
+    atomic_write_bytes(path, dumps(obj, indent=indent))
+
+def list_files(dirpath: Any, suffix: str, prefix: str = "") -> list[str]:
+    """Sorterte filnavn (med prefix) i dirpath som slutter paa suffix; [] hvis mappen mangler."""
+    try:
+        with os.scandir(dirpath) as it:
+            names = [prefix + e.name for e in it if e.name.endswith(suffix) and e.is_file(follow_symlinks=False)]
+    except FileNotFoundError:
+        return []
+    names.sort()
+    return names
@@ -1,12 +1,20 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import time, hashlib, re, urllib.parse as up
-from typing import Optional, Tuple, Dict, Any, Iterable
+import os, time, hashlib, re, urllib.parse as up
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from typing import Optional, Tuple, Dict, Any, Iterable, Callable
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from lib_io import load_json, save_json, atomic_write_bytes
+
 UA = "regg92s-marketbot/1.0"
+POOL_SIZE = 32
+
+_WS = re.compile(r"\s+")
+_TRACK = re.compile(r"^(utm_|gclid|fbclid|igshid|mc_cid|mc_eid)", re.I)
 
 def build_session(timeout_connect: float = 2.0, timeout_read: float = 3.0,
                   total_retries: int = 3, backoff: float = 0.8) -> requests.Session:
@@ -20,8 +28,9 @@ def build_session(timeout_connect: float = 2.0, timeout_read: float = 3.0,
         raise_on_status=False,
         respect_retry_after_header=True,
     )
-    s.mount("https://", HTTPAdapter(max_retries=retries))
-    s.mount("http://", HTTPAdapter(max_retries=retries))
+    adapter = HTTPAdapter(max_retries=retries, pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
 
     # pakker timeouts inn i session objektet via helper
     s.request_timeout = (timeout_connect, timeout_read)  # type: ignore[attr-defined]
@@ -30,7 +39,7 @@ def build_session(timeout_connect: float = 2.0, timeout_read: float = 3.0,
 def _strip_tracking(url: str) -> str:
     parts = up.urlsplit(url)
     q = up.parse_qsl(parts.query, keep_blank_values=True)
-    q = [(k,v) for (k,v) in q if not re.match(r'^(utm_|gclid|fbclid|igshid|mc_cid|mc_eid)', k, re.I)]
+    q = [(k,v) for (k,v) in q if not _TRACK.match(k)]
     return up.urlunsplit((parts.scheme, parts.netloc, parts.path, up.urlencode(q), ""))
 
 def normalize_url(url: str) -> str:
@@ -45,7 +54,7 @@ def normalize_url(url: str) -> str:
     return up.urlunsplit((parts.scheme, parts.netloc, path, parts.query, ""))
 
 def normalize_title(t: str) -> str:
-    return re.sub(r'\s+', ' ', t or "").strip().lower()
+    return _WS.sub(" ", t or "").strip().lower()
 
 def dedup_news(items: Iterable[Dict[str, Any]]) -> list[Dict[str, Any]]:
     seen = set()
@@ -89,6 +98,79 @@ def fetch_first_ok(session: requests.Session, urls: Iterable[str],
         raise last_exc
     raise RuntimeError("No URL responded OK")
 
+def fetch_any_ok(session: requests.Session, urls: Iterable[str],
+                 parse: Optional[Callable[[bytes], Any]] = None, grace: float = 0.0) -> Tuple[Any, str]:
+    """
+    Henter alle URL-ene (speil, i prioritert rekkefølge) samtidig og returnerer (objekt, url).
+    parse(body) gir objektet, eller None for å avvise svaret (uten parse: body som den er).
+    Et gyldig svar fra et senere speil vinner bare hvis ingen tidligere speil har gitt et
+    gyldig svar innen grace sekunder etter det første gyldige.
+    """
+    urls = list(urls)
+    ex = ThreadPoolExecutor(max_workers=len(urls) or 1)
+    futs = [ex.submit(session.get, u, timeout=session.request_timeout) for u in urls]  # type: ignore
+    pos = {f: i for i, f in enumerate(futs)}
+    got: Dict[int, Any] = {}
+    pending, deadline, last_exc = set(futs), None, None
+    try:
+        while pending:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for fut in done:
+                try:
+                    r = fut.result()
+                    if not 200 <= r.status_code < 300:
+                        continue
+                    obj = r.content if parse is None else parse(r.content)
+                except Exception as e:
+                    last_exc = e
+                    continue
+                if obj is not None:
+                    got[pos[fut]] = obj
+                    if deadline is None:
+                        deadline = time.monotonic() + grace
+            if got:
+                best = min(got)
+                if all(f.done() for f in futs[:best]) or time.monotonic() >= deadline:
+                    return got[best], urls[best]
+    finally:
+        ex.shutdown(wait=False, cancel_futures=True)
+    if last_exc:
+        raise last_exc
+    raise RuntimeError("No URL responded OK")
+
+def fetch_cached(session: requests.Session, url: str, cache_dir: Any) -> bytes:
+    """
+    GET med betinget forespørsel mot en liten disk-cache (<sha1(url)>.json/.body i cache_dir).
+    Uendret ressurs -> 304 og body fra disk; ny body skrives atomisk hvis serveren sender ETag/Last-Modified.
+    """
+    d = Path(cache_dir)
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    meta_p, body_p = d / f"{key}.json", d / f"{key}.body"
+    meta = load_json(meta_p) if body_p.exists() else {}
+    body, _, hdrs = fetch_first_ok(session, [url], etag=meta.get("etag") or None,
+                                   lastmod=meta.get("last_modified") or None)
+    if body is None:
+        os.utime(body_p); os.utime(meta_p)  # fortsatt i bruk: holdes unna prune_cache
+        return body_p.read_bytes()
+    if hdrs.get("etag") or hdrs.get("last_modified"):
+        d.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(body_p, body)
+        save_json(meta_p, hdrs)
+    return body
+
+def prune_cache(cache_dir: Any, max_age: float) -> int:
+    """Sletter filer i cache_dir som ikke er skrevet/brukt på max_age sekunder; returnerer antall."""
+    cutoff, n = time.time() - max_age, 0
+    try:
+        with os.scandir(cache_dir) as it:
+            for e in it:
+                if e.is_file(follow_symlinks=False) and e.stat().st_mtime < cutoff:
+                    os.remove(e.path); n += 1
+    except FileNotFoundError:
+        pass
+    return n
+
 def choose_first_available_png(session: requests.Session, base_variants: list[str]) -> Optional[str]:
     """
     Gitt flere fullstendige PNG-URL-er (speil eller alternative filer), returner første som svarer 200.
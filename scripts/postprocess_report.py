@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import os, json, re, datetime as dt
+import os, re, mmap, hashlib, datetime as dt
 from pathlib import Path
-from lib_net import build_session, fetch_first_ok
+from typing import Any, NamedTuple
+from lib_net import build_session, fetch_any_ok
+from lib_io import RAW_BASE, JSD_BASE, PAG_BASE, dumps, load_json, loads, save_json, atomic_write_bytes
 
 PAGES = Path("docs")
 INDEX = PAGES/"index.json"
@@ -12,41 +14,81 @@ OUT_MD    = PAGES/"report.md"
 OUT_TABLE = PAGES/"report_table.html"
 INDEX_HTML= PAGES/"index.html"
 
-RAW_BASE = "https://raw.githubusercontent.com/regg92s-hub/market-daily-report/gh-pages"
-JSD_BASE = "https://cdn.jsdelivr.net/gh/regg92s-hub/market-daily-report@gh-pages"
-PAG_BASE = "https://regg92s-hub.github.io/market-daily-report"
+_MIRROR_PREFIXES = (RAW_BASE + "/", JSD_BASE + "/", PAG_BASE + "/")  # prioritert rekkefoelge
+MIRROR_GRACE = 1.5  # sekunder et tidligere speil faar etter foerste gyldige svar
 
 INJECT_TABLE_IN_INDEX = os.environ.get("INJECT_TABLE_IN_INDEX", "false").lower() == "true"
+# valgfri memo av ferdigformaterte celler paa tvers av kjoeringer (samme .cache som generate_report)
+POSTPROC_CACHE = os.environ.get("POSTPROC_CACHE", "false").lower() == "true"
+CELLS_CACHE    = Path(os.environ.get("MDR_CACHE_DIR", ".cache"))/"report_cells.json"
+# Del av noekkelen i celle-cachen. MAA bumpes ved enhver endring i celle-formateringen
+# (_row_cells, _rnd, _pct, _jn), ellers serveres gamle celler for uendrede assets
+# (.cache lever mellom CI-kjoeringer)
+CELLS_CACHE_VERSION = 1
+# injisert tabell i index.html rammes inn av markoerer slik at neste kjoering kan bytte den ut;
+# regexen dekker tabeller injisert foer markoerene fantes
+TABLE_START_B = b"<!-- report_table -->"
+TABLE_END_B   = b"<!-- /report_table -->"
+_INJECTED_TABLE_RE = re.compile(r'<h2>Daglig tabell.*?</table>\s*<p>Generert:.*?</p>', re.DOTALL|re.IGNORECASE)
 
-def _get(d,*ks,default=None):
-    cur=d
-    for k in ks:
-        if not isinstance(cur,dict) or k not in cur: return default
-        cur=cur[k]
-    return cur
+def build_urls(path, suffix=""):
+    # prefiksene er ferdigbygd ved import; kun konkatenering per kall
+    return [p + path + suffix for p in _MIRROR_PREFIXES]
+
+class Frame(NamedTuple):
+    close_above_sma36: Any = None
+    dist_to_36MA: Any = None
+    rsi14: Any = None
+    macd: Any = None
+    macd_signal: Any = None
+    macd_hist: Any = None
+    macd_cross: Any = None
+
+# assets["frames"] er en 4-tuppel av Frame i denne rekkefoelgen; dict igjen kun i report.json
+FRAME_KEYS = ("hourly", "daily", "weekly", "monthly")
+_NO_FRAME = Frame()  # ugyldig frame i index.json: alle felt null (samme v1-skjema)
 
 def _tf(fr):
-    if not isinstance(fr,dict): return {}
+    if not isinstance(fr,dict): return _NO_FRAME
     last=fr.get("last"); sma36=fr.get("sma36")
     dist=None
     if isinstance(last,(int,float)) and isinstance(sma36,(int,float)) and sma36:
         dist=(last-sma36)/sma36
-    return {
-        "close_above_sma36": fr.get("close_above_sma36"),
-        "dist_to_36MA": dist,
-        "rsi14": fr.get("rsi14"),
-        "macd": fr.get("macd"),
-        "macd_signal": fr.get("macd_signal"),
-        "macd_hist": fr.get("macd_hist"),
-        "macd_cross": fr.get("macd_cross"),
-    }
-
-def _round(x,n=2): return round(x,n) if isinstance(x,(int,float)) else ""
+    g=fr.get
+    return Frame(g("close_above_sma36"), dist, g("rsi14"), g("macd"),
+                 g("macd_signal"), g("macd_hist"), g("macd_cross"))
+
+def _frames_json(frames):
+    return {k: f._asdict() for k, f in zip(FRAME_KEYS, frames)}
+
+def _looks_like_html(raw: bytes) -> bool:
+    return raw[:200].lower().startswith((b"<!doctype", b"<html"))
+
+def _parse_index(raw: bytes):
+    # speilsvar godtas kun som ferdig parset index (dict med summary); ellers proeves neste speil
+    if _looks_like_html(raw):
+        return None
+    try:
+        idx = loads(raw)
+    except Exception:
+        return None
+    return idx if isinstance(idx, dict) and "summary" in idx else None
+
+# celle-hjelpere: ett typesjekk per verdi. isinstance som foer, saa bool og numpy-skalarer
+# (float-subklasser) formateres likt som i baseline
+_NUM = (int, float)
+def _rnd(x,n=2): return str(round(x,n)) if isinstance(x,_NUM) else ""
+def _pct(x): return str(round(x*100,2)) if isinstance(x,_NUM) else ""
+def _jn(v): return "Ja" if v else ("Nei" if v is False else "")
 
 def build_assets(idx):
-    assets = _get(idx,"summary","assets",default={}) or {}
+    summary = idx.get("summary") if isinstance(idx,dict) else None
+    assets = (summary.get("assets") if isinstance(summary,dict) else None) or {}
     out=[]
     for t,a in assets.items():
+        frames = a.get("frames")
+        if not isinstance(frames,dict): frames = {}
+        daily = frames.get("daily")
         o={
             "ticker": t,
             "display_name": a.get("display_name"),
@@ -62,22 +104,17 @@ def build_assets(idx):
             "gdx_gld_ratio_vs_50dma": a.get("gdx_gld_ratio_vs_50dma"),
             "sil_slv_ratio_vs_50dma": a.get("sil_slv_ratio_vs_50dma"),
             "vol20_up_ok": a.get("vol20_up_ok"),
-            "frames": {
-                "hourly":  _tf(_get(a,"frames","hourly",default={})),
-                "daily":   _tf(_get(a,"frames","daily",default={})),
-                "weekly":  _tf(_get(a,"frames","weekly",default={})),
-                "monthly": _tf(_get(a,"frames","monthly",default={})),
-            }
+            # manglende frame -> alle noekler med null (som baseline _get default={})
+            "frames": tuple(_tf(frames.get(k, {})) for k in FRAME_KEYS),
         }
-        last = _get(a,"frames","daily","last")
+        last = daily.get("last") if isinstance(daily,dict) else None
         if isinstance(last,(int,float)):
             if isinstance(o["52w_high"],(int,float)): o["is_52w_high"] = last >= o["52w_high"]*0.999
             if isinstance(o["52w_low"], (int,float)): o["is_52w_low"]  = last <= o["52w_low"]*1.001
         out.append(o)
     return out
 
-def build_table_html(assets, gen):
-    header = """
+_TABLE_HEAD = """
 <h2>Daglig tabell (numerisk)</h2>
 <table>
 <thead>
@@ -93,84 +130,106 @@ def build_table_html(assets, gen):
 </tr>
 </thead>
 <tbody>
-"""
-    rows=[]
+""".encode("utf-8")
+
+# kolonnene i HTML-tabellen; markdown-oversikten bruker et utvalg (_MD_COLS)
+_MD_COLS = (0, 1, 2, 4, 5, 9)
+
+def _row_cells(a):
+    """Ferdigformaterte celler for ett asset, delt av HTML- og markdown-rendrer."""
+    _, daily, weekly, monthly = a["frames"]
+    g = a.get
+    return (a["ticker"],
+            g("display_name") or "",
+            g("category_title") or "",
+            ("H" if g("is_52w_high") else "") + ("L" if g("is_52w_low") else ""),
+            _pct(g("dist_to_36WMA")) + "%",
+            _pct(g("dist_to_36MMA")) + "%",
+            _jn(daily.close_above_sma36),
+            _jn(weekly.close_above_sma36),
+            _jn(monthly.close_above_sma36),
+            _rnd(monthly.rsi14))
+
+def render_cells(assets):
+    if not POSTPROC_CACHE:
+        return [_row_cells(a) for a in assets]
+    # noekkel: blake2b av versjon + asset serialisert som i report.json med sorterte noekler;
+    # kun treff fra denne kjoeringen skrives tilbake, saa cachen vokser ikke
+    ver = f"{CELLS_CACHE_VERSION}:".encode()
+    old = load_json(CELLS_CACHE)
+    new, out = {}, []
     for a in assets:
-        d=a["frames"]; daily=d["daily"]; weekly=d["weekly"]; monthly=d["monthly"]
-        rows.append(f"<tr>"
-            f"<td>{a['ticker']}</td>"
-            f"<td>{a.get('display_name') or ''}</td>"
-            f"<td>{a.get('category_title') or ''}</td>"
-            f"<td>{'H' if a.get('is_52w_high') else ''}{'L' if a.get('is_52w_low') else ''}</td>"
-            f"<td>{_round((a.get('dist_to_36WMA') or 0)*100,2) if isinstance(a.get('dist_to_36WMA'),(int,float)) else ''}%</td>"
-            f"<td>{_round((a.get('dist_to_36MMA') or 0)*100,2) if isinstance(a.get('dist_to_36MMA'),(int,float)) else ''}%</td>"
-            f"<td>{'Ja' if daily.get('close_above_sma36') else ('Nei' if daily.get('close_above_sma36') is False else '')}</td>"
-            f"<td>{'Ja' if weekly.get('close_above_sma36') else ('Nei' if weekly.get('close_above_sma36') is False else '')}</td>"
-            f"<td>{'Ja' if monthly.get('close_above_sma36') else ('Nei' if monthly.get('close_above_sma36') is False else '')}</td>"
-            f"<td>{_round(monthly.get('rsi14'),2)}</td>"
-            f"</tr>")
-    footer = f"""
-</tbody>
+        raw = dumps({**a, "frames": _frames_json(a["frames"])}, sort_keys=True)
+        k = hashlib.blake2b(ver + raw, digest_size=16).hexdigest()
+        cells = old.get(k)
+        cells = tuple(cells) if isinstance(cells, list) else _row_cells(a)
+        new[k] = cells; out.append(cells)
+    if new.keys() != old.keys():  # samme noekler -> samme celler, ingen skriving
+        CELLS_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        save_json(CELLS_CACHE, new, indent=False)
+    return out
+
+def build_table_html(rendered, gen):
+    # bytes rett inn i en bytearray (amortisert vekst), ingen str-kopi av hele tabellen;
+    # resultatet skrives direkte til report_table.html og spleises inn i index.html
+    buf = bytearray(_TABLE_HEAD)
+    for cells in rendered:
+        buf += ("<tr><td>" + "</td><td>".join(cells) + "</td></tr>\n").encode("utf-8")
+    buf += f"""</tbody>
 </table>
 <p>Generert: {gen}</p>
-"""
-    return header + "\n".join(rows) + footer
+""".encode("utf-8")
+    return buf
 
 def main():
     gen = dt.datetime.utcnow().isoformat(timespec="seconds")+"Z"
     idx = None
     missing_notes = []
 
-    def is_html_text(path: Path) -> bool:
+    # en lesing i bytes: HTML-sjekken ser kun paa starten, og orjson parser bytes direkte
+    # (ingen UTF-8-dekoding av hele fila bare for aa kaste den)
+    try:
+        index_raw = INDEX.read_bytes()
+    except OSError:
+        index_raw = None
+    if index_raw is not None and not _looks_like_html(index_raw):
         try:
-            head = path.read_text(encoding="utf-8")[:200].lower()
-            return head.startswith("<!doctype") or head.startswith("<html")
-        except Exception:
-            return False
-
-    if INDEX.exists() and not is_html_text(INDEX):
-        try:
-            idx = json.loads(INDEX.read_text(encoding="utf-8"))
+            idx = loads(index_raw)
             gen = idx.get("generated_local") or gen
         except Exception as e:
             missing_notes.append(f"docs/index.json invalid JSON: {e}")
 
     if idx is None:
         session = build_session()
-        urls = [
-            f"{RAW_BASE}/index.json?t={os.environ.get('GITHUB_RUN_ID','postproc')}",
-            f"{JSD_BASE}/index.json?t={os.environ.get('GITHUB_RUN_ID','postproc')}",
-            f"{PAG_BASE}/index.json?t={os.environ.get('GITHUB_RUN_ID','postproc')}",
-        ]
+        urls = build_urls("index.json", f"?t={os.environ.get('GITHUB_RUN_ID','postproc')}")
         try:
-            body, used, hdrs = fetch_first_ok(session, urls)
-            if body:
-                idx = json.loads(body.decode("utf-8", errors="replace"))
-                gen = idx.get("generated_local") or gen
-                missing_notes.append(f"postprocess: brukte speil for index.json ({used})")
-            else:
-                missing_notes.append("postprocess: index.json 304 Not Modified – beholder lokal hvis fantes")
+            # alle speilene samtidig; RAW (ferskest) foretrekkes hvis den svarer innen
+            # MIRROR_GRACE, ellers vinner raskeste gyldige (jsDelivr-kopien kan vaere timer gammel)
+            idx, used = fetch_any_ok(session, urls, parse=_parse_index, grace=MIRROR_GRACE)
+            gen = idx.get("generated_local") or gen
+            missing_notes.append(f"postprocess: brukte speil for index.json ({used})")
         except Exception as e:
             missing_notes.append(f"postprocess: klarte ikke hente index.json fra speil: {e}")
 
     assets = build_assets(idx or {"summary": {"assets": {}}})
 
     news = {}
-    if NEWS.exists():
-        try: news = json.loads(NEWS.read_text(encoding="utf-8"))
-        except Exception as e:
-            news = {}
-            missing_notes.append(f"news/news.json invalid JSON: {e}")
+    try: news = loads(NEWS.read_bytes())
+    except FileNotFoundError: pass
+    except Exception as e:
+        news = {}
+        missing_notes.append(f"news/news.json invalid JSON: {e}")
 
-    OUT_JSON.write_text(json.dumps({
+    # report.json leses av maskiner (ChatGPT-eksport, speil): kompakt, uten indent
+    save_json(OUT_JSON, {
         "generated_local": gen,
         "spec_version": "v1",
-        "assets": assets,
+        "assets": [{**a, "frames": _frames_json(a["frames"])} for a in assets],
         "news": news,
         "missing": missing_notes
-    }, ensure_ascii=False, indent=2), encoding="utf-8")
+    }, indent=False)
 
-    md = [
+    md = ["\n".join([
         f"# Daglig rapport – {gen}",
         "",
         "## Manglet/feilet",
@@ -180,30 +239,49 @@ def main():
         "",
         "| Ticker | Navn | Kategori | Dist36WMA | Dist36MMA | M-RSI14 |",
         "|---|---|---|---:|---:|---:|",
-    ]
-    for a in assets:
-        monthly=a["frames"]["monthly"]
-        md.append(
-            f"| {a['ticker']} | "
-            f"{a.get('display_name') or ''} | "
-            f"{a.get('category_title') or ''} | "
-            f"{_round((a.get('dist_to_36WMA') or 0)*100,2) if isinstance(a.get('dist_to_36WMA'),(int,float)) else ''}% | "
-            f"{_round((a.get('dist_to_36MMA') or 0)*100,2) if isinstance(a.get('dist_to_36MMA'),(int,float)) else ''}% | "
-            f"{_round(monthly.get('rsi14'),2)} | "
-        )
-    OUT_MD.write_text("\n".join(md), encoding="utf-8")
-
-    table_html = build_table_html(assets, gen)
-    OUT_TABLE.write_text(table_html, encoding="utf-8")
+    ])]
+    rendered = render_cells(assets)
+    for cells in rendered:
+        md.extend(("\n| ", " | ".join([cells[i] for i in _MD_COLS]), " | "))
+    OUT_MD.write_text("".join(md), encoding="utf-8")
+
+    table_html = build_table_html(rendered, gen)
+    atomic_write_bytes(OUT_TABLE, table_html)
 
     if INJECT_TABLE_IN_INDEX and INDEX_HTML.exists():
         try:
-            html = INDEX_HTML.read_text(encoding="utf-8")
-            html = re.sub(r'<h2>Daglig tabell.*?</table>\s*<p>Generert:.*?</p>', "", html, flags=re.DOTALL|re.IGNORECASE)
-            html = html.replace("</body>", table_html + "\n</body>") if "</body>" in html else (html + "\n" + table_html)
-            INDEX_HTML.write_text(html, encoding="utf-8")
+            inject_table(table_html)
         except Exception:
             pass
 
+def inject_table(table_html):
+    block = TABLE_START_B + table_html + TABLE_END_B
+    if INDEX_HTML.stat().st_size == 0:  # mmap takler ikke tom fil: tabellen legges til som foer
+        atomic_write_bytes(INDEX_HTML, _splice_html("", block.decode("utf-8")).encode("utf-8"))
+        return
+    # markoerene fra forrige injeksjon: bytes-soek i mmap, ingen dekoding/regex av hele fila
+    with open(INDEX_HTML, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        s = mm.find(TABLE_START_B)
+        e = mm.find(TABLE_END_B, s) if s >= 0 else -1
+        if e < 0:
+            html = mm[:].decode("utf-8")
+        else:
+            tmp = INDEX_HTML.with_name(INDEX_HTML.name + ".tmp")
+            with open(tmp, "wb") as out:
+                out.write(mm[:s]); out.write(block); out.write(mm[e + len(TABLE_END_B):])
+    if e >= 0:
+        os.replace(tmp, INDEX_HTML)
+        return
+    atomic_write_bytes(INDEX_HTML, _splice_html(html, block.decode("utf-8")).encode("utf-8"))
+
+def _splice_html(html, table_html):
+    # uten markoerer (eldre index.html): fjern ev. gammel tabell og sett inn foer </body>;
+    # ett soek + en join i stedet for `in` + replace (to soek og en ekstra kopi)
+    html = _INJECTED_TABLE_RE.sub("", html)
+    i = html.rfind("</body>")  # den siste er den ekte (inline-script kan inneholde strengen)
+    if i < 0:
+        return "".join((html, "\n", table_html))
+    return "".join((html[:i], table_html, "\n", html[i:]))
+
 if __name__ == "__main__":
     main()